@@ -0,0 +1,254 @@
+"""Boolean functions and S-boxes, as truth tables in numpy arrays
+ A function of n inputs is an array of 2^n bits, tt[x] = f(x);
+ an S-box of n to m bits is an array of 2^n values
+  >>> maj = truth_table(lambda x: (x & 1) + (x >> 1 & 1) + (x >> 2 & 1) > 1, 3)
+  >>> maj.tolist()
+  [0, 0, 0, 1, 0, 1, 1, 1]
+
+ walsh(tt): the Walsh spectrum, sum of (-1)^(f(x) + u.x) for each u
+  >>> walsh(maj).tolist()
+  [0, 4, 4, 0, 4, 0, 0, -4]
+
+ anf(tt): the algebraic normal form by the Moebius transform,
+ anf[u] = 1 iff the monomial prod of x_i for bits i of u appears
+  >>> [u for u in range(8) if anf(maj)[u]], degree(maj), nonlinearity(maj)
+  ([3, 5, 6], 2, 2)
+
+ S-boxes: nonlinearity and degree over all nonzero components b.S,
+ differential uniformity by the DDT of ualgebra
+  >>> from uutils.dmath.ualgebra import F8
+  >>> aes = F8.pow_array(F8.values(), 254)
+  >>> sbox_nonlinearity(aes, 8), sbox_degree(aes, 8), differential_uniformity(aes, 8)
+  (112, 7, 4)
+
+ Minimization: cubes in the masks/products notation (mask, v) of
+ ubits, {x | x & mask == v}. The ternary cube transform marks every
+ cube inside the on-set and don't-care set at once: 3^n cubes,
+ digits 0, 1 for fixed bits and 2 for free ones.
+ prime_implicants(on, dc) are the maximal cubes, minimize(on, dc) a
+ small cover: the essential primes, then greedily the prime covering
+ most of the rest around the hardest point left; the candidates there
+ are the products through the point, by their free bits from masks()
+  >>> from uutils.dmath.ubits import products
+  >>> inside = [(m, v) for k in range(4) for m, v in products(k, 3)
+  ...           if all(maj[x] for x in range(8) if x & m == v)]
+  >>> primes = [(m, v) for m, v in inside if not any((m, v) != (m2, v2)
+  ...           and m & m2 == m2 and v & m2 == v2 for m2, v2 in inside)]
+  >>> sorted(primes) == sorted(zip(*[a.tolist() for a in prime_implicants(maj)]))
+  True
+  >>> [(bin(m), bin(v)) for m, v in minimize(maj)]
+  [('0b11', '0b11'), ('0b101', '0b101'), ('0b110', '0b110')]
+  >>> on = truth_table(lambda x: x % 3 == 0, 4)
+  >>> cover = minimize(on, dc = truth_table(lambda x: x > 12, 4))
+  >>> len(cover), all(evaluate(cover, x) == on[x] for x in range(13))
+  (5, True)
+
+ Logic(func, n, m): a minimized sum of products for each output bit
+ of a partial function, func[x] is None where it is undefined
+  >>> L = Logic([3, 1, None, 2], 2, 2)
+  >>> [L(x) for x in (0, 1, 3)], L.f
+  ([3, 1, 2], [[(2, 0)], [(1, 0), (2, 2)]])
+"""
+import numpy as np
+from uutils.dmath.ubits import hw, hw_array, walsh_hadamard, masks
+
+
+def truth_table(f, n):
+    "bits of f at 0..2^n-1, f a callable (on arrays, or on ints) or a sequence"
+    x = np.arange(1 << n, dtype=np.uint64)
+    if callable(f):
+        try:
+            res = np.asarray(f(x))
+            if res.shape != x.shape:
+                raise TypeError
+        except (TypeError, ValueError):
+            res = np.array([f(int(i)) for i in x])
+    else:
+        res = np.asarray(f)
+    return (res != 0).astype(np.uint8)
+
+def _n(tt):
+    n = len(tt).bit_length() - 1
+    if len(tt) != 1 << n:
+        raise ValueError("A truth table of 2^n entries expected")
+    return n
+
+def walsh(tt):
+    return walsh_hadamard(1 - 2 * np.asarray(tt, dtype=np.int64), axis=-1)
+
+def moebius(a):
+    "the Moebius transform over GF(2) along the last axis, an involution"
+    a = np.array(a, dtype=np.uint8) & 1
+    n = a.shape[-1]
+    h = 1
+    while h < n:
+        v = a.reshape(a.shape[:-1] + (n // (2 * h), 2, h))
+        v[..., 1, :] ^= v[..., 0, :]
+        h *= 2
+    return a
+
+anf = moebius
+
+def degree(tt):
+    "the algebraic degree, -1 for 0"
+    u = np.flatnonzero(moebius(tt)).astype(np.uint64)
+    return int(hw_array(u).max()) if len(u) else -1
+
+def nonlinearity(tt):
+    "the distance to the affine functions"
+    return (len(tt) - int(abs(walsh(tt)).max())) // 2
+
+def components(sbox, m):
+    "truth tables of b.S for all b < 2^m, one row each"
+    b = np.arange(1 << m, dtype=np.uint64)
+    S = np.asarray(sbox, dtype=np.uint64)
+    return (hw_array(b[:, None] & S[None, :]) & 1).astype(np.uint8)
+
+def sbox_nonlinearity(sbox, m):
+    W = walsh(components(sbox, m)[1:])
+    return (len(sbox) - int(abs(W).max())) // 2
+
+def sbox_degree(sbox, m):
+    "the maximal degree of a component"
+    A = moebius(components(sbox, m)[1:])
+    u = np.arange(len(sbox), dtype=np.uint64)
+    return int((hw_array(u)[None, :] * A).max())
+
+def differential_uniformity(sbox, n, m=None):
+    from uutils.dmath.ualgebra import V2
+    D = V2(n).ddt(sbox, V2(m or n))
+    return int(D[1:].max())
+
+def ternary(tt):
+    """the cube transform: t[c] = 1 iff the cube c lies in the set tt;
+    c = sum of d_i * 3^i, d_i = 0, 1 for x_i fixed, 2 for x_i free"""
+    n = _n(tt)
+    a = np.asarray(tt, dtype=bool).reshape((2,) * n) # axis j is bit n-1-j
+    for j in range(n):
+        lo, hi = np.split(a, [1], axis=j)
+        a = np.concatenate((lo, hi, lo & hi), axis=j)
+    return a.ravel()
+
+def _cubes(c, n):
+    "(masks, values) of ternary indices c"
+    c = np.asarray(c, dtype=np.int64)
+    mask, v = np.zeros(len(c), dtype=np.uint64), np.zeros(len(c), dtype=np.uint64)
+    for i in range(n):
+        c, d = np.divmod(c, 3)
+        mask |= (d != 2).astype(np.uint64) << np.uint64(i)
+        v |= (d == 1).astype(np.uint64) << np.uint64(i)
+    return mask, v
+
+def _points(mask, v, n):
+    "the points of a cube"
+    pts = np.array([v], dtype=np.int64)
+    free = ~mask & ((1 << n) - 1)
+    while free:
+        bit = free & -free
+        pts = np.concatenate((pts, pts | bit))
+        free ^= bit
+    return pts
+
+def _ternary_digits(n):
+    "t[y] = sum of y_i * 3^i, binary digits read in base 3"
+    t = np.zeros(1, dtype=np.int64)
+    for i in range(n):
+        t = np.concatenate((t, t + 3**i))
+    return t
+
+def _containing(x, t, S):
+    """ternary indices of the cubes containing the point x,
+    with the bits of S free and the others as in x"""
+    return t[x] + 2 * t[S] - t[S & x]
+
+def _primes(allowed, on, n):
+    "ternary indicator of the prime cubes of allowed meeting on"
+    T = ternary(allowed).reshape((3,) * n)
+    P = T.copy()
+    for j in range(n):
+        free = np.take(T, [2], axis=j)
+        for d in (0, 1):
+            idx = [slice(None)] * n
+            idx[j] = d
+            P[tuple(idx)] &= ~np.squeeze(free, axis=j)
+    return P.ravel() & ~ternary(~np.asarray(on, dtype=bool))
+
+def prime_implicants(on, dc=None):
+    "the prime cubes (masks, values) of on | dc meeting on"
+    n = _n(on)
+    on = np.asarray(on, dtype=bool)
+    allowed = on | (np.asarray(dc, dtype=bool) if dc is not None else False)
+    return _cubes(np.flatnonzero(_primes(allowed, on, n)), n)
+
+def _coverage(P, n):
+    "how many cubes of the ternary indicator P contain each point"
+    a = P.reshape((3,) * n).astype(np.int32)
+    for j in range(n):
+        lo, hi, free = np.split(a, 3, axis=j)
+        a = np.concatenate((lo + free, hi + free), axis=j)
+    return a.ravel()
+
+def minimize(on, dc=None):
+    """a cover of on by prime cubes of on | dc, a list of (mask, v)
+    with the largest cubes first"""
+    n = _n(on)
+    on = np.asarray(on, dtype=bool)
+    allowed = on | (np.asarray(dc, dtype=bool) if dc is not None else False)
+    P = _primes(allowed, on, n)
+    count = _coverage(P, n)
+    # primes holding a point that no other prime covers
+    E = P & ~ternary(~(on & (count == 1)))
+    chosen = list(np.flatnonzero(E))
+    left = on.copy()
+    left[_coverage(E, n) > 0] = False
+    t = _ternary_digits(n)
+    # the free bits of the candidates, at most as many as the largest prime has
+    fixed, _ = _cubes(np.flatnonzero(P), n)
+    free = n - int(hw_array(fixed).min()) if len(fixed) else 0
+    S = np.concatenate([b for k in range(free + 1)
+                        for b in masks(k, n, batch=1 << 16)]).astype(np.int64)
+    # the point with the fewest primes, the prime with most points left
+    for x in np.flatnonzero(left)[np.argsort(count[left], kind='stable')].tolist():
+        if not left[x]:
+            continue
+        c = _containing(x, t, S)
+        c = c[P[c]]
+        fixed, values = _cubes(c, n)
+        gain = [int(left[_points(int(m), int(v), n)].sum())
+                for m, v in zip(fixed, values)]
+        best = int(np.argmax(gain))
+        chosen.append(c[best])
+        left[_points(int(fixed[best]), int(values[best]), n)] = False
+    fixed, values = _cubes(chosen, n)
+    cover = sorted(zip(fixed.tolist(), values.tolist()), key=lambda p: (hw(p[0]), p))
+    return cover
+
+def evaluate(cover, x):
+    "the sum of products at x"
+    return int(any(x & m == v for m, v in cover))
+
+
+class Logic(object):
+    '''logical representation of a (partial) function f
+       from n bits to m bits: a minimized sum of products,
+       (mask, v) pairs, for each output bit'''
+    def __init__(self, func, n, m):
+        self.input_width = n
+        self.output_width = m
+        values = [func[x] for x in range(1 << n)]
+        dc = np.array([v is None for v in values])
+        values = np.array([v or 0 for v in values], dtype=np.int64)
+        self.f = [minimize(((values >> i) & 1).astype(bool) & ~dc, dc)
+                  if ((values >> i) & 1 & ~dc).any() else [] for i in range(m)]
+    def __call__(self, x):
+        return sum(evaluate(sop, x) << i for i, sop in enumerate(self.f))
+
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1:
+        if   sys.argv[1] == '-v':
+            import doctest
+            doctest.testmod()
+        elif sys.argv[1] == '-h':
+            print ("Use -v  to run self-test")
@@ -1,12 +1,260 @@
-def parity(w):
-    "xor of all bits of a 64-bit word"
-    w ^= w >> 32
-    w ^= w >> 16
-    w ^= w >> 8
-    w ^= w >> 4
-    w ^= w >> 2
-    w ^= w >> 1
-    return w & 1
+"""Galois LFSR over GF(2)[x]/p, see LFSR16 for an example
+ shift('r') multiplies the value by x, shift('l') divides it by x,
+ the output bit of a shift to the right is the bit that overflows:
+  >>> a = LFSR16(0x8001)
+  >>> a.shift('r'); a.value == (0x0002 ^ LFSR16.p ^ (1 << 16))
+  True
+
+ advance(n, direction='r'): n shifts at once, by polynomial multiplication
+  >>> a, b = LFSR16(0x1234), LFSR16(0x1234)
+  >>> for i in range(1000): a.shift('r')
+  >>> b.advance(1000); a.value == b.value
+  True
+  >>> b.advance(1000, 'l'); b.value == 0x1234
+  True
+
+ output(nbits): the output of nbits shifts, as bytes MSB first,
+ computed a byte at a time by lookup tables
+  >>> a, b = LFSR16(0x1234), LFSR16(0x1234)
+  >>> bits = []
+  >>> for i in range(20):
+  ...     bits.append(a.value >> 15)
+  ...     a.shift('r')
+  >>> b.output(20) == int(''.join(map(str, bits + [0] * 4)), 2).to_bytes(3, 'big')
+  True
+  >>> a.value == b.value
+  True
+  >>> len(b.output_array(10000))
+  1250
+
+ Multiplication and Montgomery-ladder powers use tables built on first
+ use and cached per polynomial: log/antilog tables for deg <= 16,
+ otherwise carry-less products reduced by taps or by Barrett reduction
+  >>> a = LFSR16(0x53)
+  >>> (a * LFSR16(0xca)).value == polymod(clmul(0x53, 0xca), LFSR16.p)
+  True
+  >>> a ** 0xffff == LFSR16(1), (a ** 3).value == (a * a * a).value
+  (True, True)
+
+ pow_many(exponents): powers for an array of exponents
+  >>> a.pow_many([0, 1, 3]).tolist() == [1, 0x53, (a * a * a).value]
+  True
+
+ lfsr_class(deg, p=None): an LFSR class for the primitive polynomial
+ of the registry primitive_taps (deg 8..128), or for p.
+ Classes are cached, tables are shared by all classes of a polynomial;
+ degree 16 is LFSR16.
+  >>> F = lfsr_class(64)
+  >>> F is lfsr_class(64), F.__name__, hex(F.p), lfsr_class(16) is LFSR16
+  (True, 'LFSR64', '0x1000000000000001b', True)
+  >>> F(2) ** ((1 << 64) - 1) == F(1)
+  True
+
+ is_primitive(p): validates p by Polynomial.is_primitive; degrees
+ missing from primitive_taps are searched for (sparse ones first).
+ The search factors 2^deg - 1 by Pollard rho within rho_effort of 
+ ualgebra; beyond that, pass the prime factors as factors=
+  >>> hex(lfsr_class(137, factors = [32032215596496435569, 5439042183600204290159]).p)
+  '0x20000000000000000000000000000200001'
+  >>> is_primitive(F.p), is_primitive(0x11b), hex(primitive_polynomial(160))
+  (True, False, '0x1000000000000000000000000000000000000002d')
+
+ If cache_dir is set (see set_cache_dir, or the environment variable
+ UUTILS_LFSR_CACHE), the tables are stored there and loaded by
+ later processes instead of being rebuilt. Tables built inside a
+ deferred_store() block (e.g. warming many classes) are stored once
+ at its end.
+"""
+import pickle
+from contextlib import contextmanager
+from os import environ, getpid, makedirs, replace
+from os.path import join
+import numpy as np
+from numba import jit
+from uutils.dmath.ubits import clmul
+from uutils.dmath.ualgebra import Polynomial
+
+
+def polymod(a, p):
+    "a mod p over GF(2)"
+    deg = p.bit_length() - 1
+    while a.bit_length() > deg:
+        a ^= p << (a.bit_length() - 1 - deg)
+    return a
+
+
+def xpow(n, p):
+    "x**n mod p over GF(2)"
+    res = 1
+    for bit in bin(n)[2:]:
+        res = polymod(clmul(res, res), p)
+        if bit == "1":
+            res = polymod(res << 1, p)
+    return res
+
+
+def byte_tables(p):
+    """for the top byte b of a value: the reduction of b*x**deg,
+    and the output bits of the 8 shifts"""
+    deg = p.bit_length() - 1
+    step, out = [], []
+    for b in range(256):
+        v, o = b << (deg - 8), 0
+        for i in range(8):
+            o = (o << 1) | (v >> (deg - 1))
+            v <<= 1
+            if v >> deg:
+                v ^= p
+        step.append(v)
+        out.append(o)
+    return step, out
+
+
+def polydiv(a, p):
+    "a // p over GF(2)"
+    deg, q = p.bit_length() - 1, 0
+    while a.bit_length() > deg:
+        shift = a.bit_length() - 1 - deg
+        q |= 1 << shift
+        a ^= p << shift
+    return q
+
+
+def log_tables(p):
+    """exp[i] = x**i for i < 2*(2**deg-1) and its inverse log,
+    None if x is not primitive"""
+    deg = p.bit_length() - 1
+    order = (1 << deg) - 1
+    exp, log = [0] * (2 * order), [0] * (order + 1)
+    v = 1
+    for i in range(order):
+        if v == 1 and i:
+            return None
+        exp[i] = exp[i + order] = v
+        log[v] = i
+        v <<= 1
+        if v >> deg:
+            v ^= p
+    return exp, log
+
+
+_tables = dict()  # p -> tables of the polynomial
+cache_dir = environ.get("UUTILS_LFSR_CACHE")
+
+
+def set_cache_dir(path):
+    "persist the tables in path; None to stop"
+    global cache_dir
+    cache_dir = path
+
+
+def _cache_file(p):
+    return join(cache_dir, "lfsr_{:x}.pkl".format(p))
+
+
+def tables(p):
+    "tables of the polynomial p, shared by all its instances and classes"
+    t = _tables.get(p)
+    if t is None:
+        t = _tables[p] = dict()
+        if cache_dir:
+            try:
+                with open(_cache_file(p), "rb") as f:
+                    t.update(pickle.load(f))
+            except (IOError, EOFError, pickle.UnpicklingError):
+                pass
+    return t
+
+
+_pending = None  # polynomials to store when the outermost deferred_store ends
+
+@contextmanager
+def deferred_store():
+    "store the tables built inside once, at the end"
+    global _pending
+    if _pending is not None:
+        yield
+        return
+    _pending = set()
+    try:
+        yield
+    finally:
+        pending, _pending = _pending, None
+        for p in pending:
+            store_tables(p)
+
+def store_tables(p):
+    "write the tables of p to cache_dir, atomically"
+    if not cache_dir:
+        return
+    if _pending is not None:
+        _pending.add(p)
+        return
+    fname = _cache_file(p)
+    tmp = "{}.{}".format(fname, getpid())
+    try:
+        makedirs(cache_dir, exist_ok=True)
+        with open(tmp, "wb") as f:
+            pickle.dump(_tables[p], f)
+        replace(tmp, fname)
+    except IOError:
+        print("Cannot store", fname)
+
+
+class cached_table(object):
+    """a table of the class polynomial built by build(cls) on first use;
+    an instance attribute of the same name overrides it"""
+    def __init__(self, build):
+        self.build, self.name = build, build.__name__
+    def __get__(self, obj, cls):
+        t = tables(cls.p)
+        if self.name not in t:
+            with deferred_store():
+                t[self.name] = self.build(cls)
+                store_tables(cls.p)
+        return t[self.name]
+
+
+@jit(nopython=True)
+def _mulmod(a, b, p, top):
+    res = np.uint64(0)
+    one = np.uint64(1)
+    while b:
+        if b & one:
+            res ^= a
+        b >>= one
+        a <<= one
+        if a & top:
+            a ^= p
+    return res
+
+
+@jit(nopython=True)
+def _pow_many(a, exps, p, deg, out):
+    "a**e for each e of exps, deg <= 63"
+    one = np.uint64(1)
+    top = one << np.uint64(deg)
+    for i in range(len(exps)):
+        e, x, y = exps[i], one, a
+        while e:
+            if e & one:
+                x = _mulmod(x, y, p, top)
+            y = _mulmod(y, y, p, top)
+            e >>= one
+        out[i] = x
+
+
+@jit(nopython=True)
+def _keystream(value, deg, step, out_table, out):
+    "byte-wise output of the LFSR, deg <= 64"
+    shift = np.uint64(deg - 8)
+    mask = np.uint64((1 << (deg - 1)) - 1) << np.uint64(1) | np.uint64(1)
+    for i in range(len(out)):
+        top = value >> shift
+        out[i] = out_table[top]
+        value = ((value << np.uint64(8)) & mask) ^ step[top]
+    return value
+
 
 def mult_table(lfsr):
     r = lfsr(1)
@@ -16,7 +264,43 @@ def mult_table(lfsr):
         table.append(r.value)
     return table
 
+def _logs(lfsr):
+    deg = lfsr.p.bit_length() - 1
+    return log_tables(lfsr.p) if deg <= 16 else None
+
+def _log_arrays(lfsr):
+    if lfsr.logs is None:
+        return None
+    exp, log = lfsr.logs
+    return np.array(exp, dtype=np.uint64), np.array(log, dtype=np.uint64)
+
+def _reduction(lfsr):
+    """('taps', mask, taps) if folding by the low taps of p halves 
+    the degree, ('barrett', mask, x**(2*deg) // p) otherwise"""
+    deg = lfsr.p.bit_length() - 1
+    low = lfsr.p ^ (1 << deg)
+    taps = [i for i in range(deg) if low >> i & 1]
+    if len(taps) <= 8 and low.bit_length() <= deg // 2:
+        return 'taps', (1 << deg) - 1, taps
+    return 'barrett', (1 << deg) - 1, polydiv(1 << (2 * deg), lfsr.p)
+
+def _byte_arrays(lfsr):
+    step, out = byte_tables(lfsr.p)
+    return np.array(step, dtype=np.uint64), np.array(out, dtype=np.uint8)
+
 class LFSR(object):
+    mult_table = cached_table(mult_table)
+    logs = cached_table(_logs)
+    log_arrays = cached_table(_log_arrays)
+    reduction = cached_table(_reduction)
+    byte_arrays = cached_table(_byte_arrays)
+    @classmethod
+    def build_tables(cls):
+        "build all the tables at once"
+        with deferred_store():
+            for name, attr in vars(LFSR).items():
+                if isinstance(attr, cached_table):
+                    getattr(cls, name)
     def __init__(self, value):
         self.value = value
         self.deg  = self.p.bit_length() - 1
@@ -34,58 +318,185 @@ class LFSR(object):
             self.value >>= 1
         else: raise ValueError("Unrecognized shift direction")
     def reverse_bits(self):
-        res, res_bit, val = 0, 1, self.value
-        for i in range(self.deg):
-            val <<= 1
-            if val & self.msbit: res ^= res_bit
-            res_bit <<= 1
-        return res
+        return int("{{:0{}b}}".format(self.deg).format(self.value)[::-1], 2)
+    def advance(self, n, direction='r'):
+        "n shifts, by multiplication by x**n or x**-n"
+        if direction == 'r':
+            x = xpow(n, self.p)
+        elif direction == 'l':
+            x_inv = self.p >> 1 # x * x_inv == 1 mod p
+            x = 1
+            for bit in bin(n)[2:]:
+                x = polymod(clmul(x, x), self.p)
+                if bit == '1':
+                    x = polymod(clmul(x, x_inv), self.p)
+        else: raise ValueError("Unrecognized shift direction")
+        self.value = polymod(clmul(self.value, x), self.p)
+    def output_array(self, nbits):
+        """the output of nbits shifts to the right,
+        packed MSB first in a uint8 array"""
+        out = np.zeros((nbits + 7) // 8, dtype=np.uint8)
+        nbytes = nbits // 8
+        if 8 <= self.deg <= 64:
+            step, table = self.byte_arrays
+            self.value = int(_keystream(np.uint64(self.value), self.deg, 
+                                        step, table, out[:nbytes]))
+        else:
+            nbytes = 0
+        for i in range(8 * nbytes, nbits):
+            if self.value >> (self.deg - 1):
+                out[i >> 3] |= 0x80 >> (i & 7)
+            self.shift('r')
+        return out
+    def output(self, nbits):
+        return self.output_array(nbits).tobytes()
+    @classmethod
+    def reduce(cls, c):
+        "c mod p, for c of degree < 2*deg"
+        kind, mask, r = cls.reduction
+        deg = cls.p.bit_length() - 1
+        if kind == 'taps':
+            while c >> deg:
+                hi, c = c >> deg, c & mask
+                for t in r:
+                    c ^= hi << t
+            return c
+        q = clmul(c >> deg, r) >> deg
+        return (c ^ clmul(q, cls.p)) & mask
+    @classmethod
+    def mulmod(cls, a, b):
+        logs = cls.logs
+        if logs:
+            if not (a and b):
+                return 0
+            exp, log = logs
+            return exp[log[a] + log[b]]
+        return cls.reduce(clmul(a, b))
+    def __eq__(self, other):
+        return type(self) == type(other) and self.value == other.value
+    def __ne__(self, other):
+        return not (self == other)
     def __mul__(self, other):
-        res = 0
-        val = self.value << self.deg
-        other = other.reverse_bits()
-        for i in range(2*self.deg):
-            val >>= 1    
-            if parity(val & other):
-                res ^= self.mult_table[i]
-            # print('{:32b}\n{:32b}, {:16b}'.format(val, other, res))
-        res = type(self)(res)
-        res.mult_table = self.mult_table
-        return res
+        return type(self)(self.mulmod(self.value, other.value))
     def __pow__(self, power):
-        'secure self**power by Montgomery ladder'
-        x = type(self)(1)
-        x.mult_table = self.mult_table
-        y = self
+        'self**power by Montgomery ladder'
+        mul = self.mulmod
+        x, y = 1, self.value
         for i in range(self.deg):
             power <<= 1    
             if power & self.msbit: 
-                x = x*y
-                y = y*y
+                x = mul(x, y)
+                y = mul(y, y)
             else: 
-                y = x*y
-                x = x*x
-        return x
+                y = mul(x, y)
+                x = mul(x, x)
+        return type(self)(x)
+    def pow_many(self, exponents):
+        "self**e for each e of exponents, as an array"
+        if self.deg > 63:
+            res = []
+            for e in exponents:
+                x, y = 1, self.value
+                while e:
+                    if e & 1:
+                        x = self.mulmod(x, y)
+                    y = self.mulmod(y, y)
+                    e >>= 1
+                res.append(x)
+            return np.array(res, dtype=object)
+        e = np.asarray(exponents, dtype=np.uint64)
+        if self.logs:
+            exp, log = self.log_arrays
+            order = np.uint64((1 << self.deg) - 1)
+            if not self.value:
+                return (e == 0).astype(np.uint64)
+            return exp[(e % order) * log[self.value] % order]
+        out = np.empty(len(e), dtype=np.uint64)
+        _pow_many(np.uint64(self.value), e, np.uint64(self.p), self.deg, out)
+        return out
 
 
 class LFSR16(LFSR):
     p = (1<<16)|(1<<12)|(1<<3)|(1<<1)|1
 
 
+# x**deg + sum(x**t for t in taps) + 1 is primitive
+primitive_taps = {
+    8: (4, 3, 2), 9: (4,), 10: (3,), 11: (2,), 12: (6, 4, 1), 13: (4, 3, 1),
+    14: (5, 3, 1), 15: (1,), 16: (12, 3, 1), 17: (3,), 18: (7,), 19: (5, 2, 1),
+    20: (3,), 21: (2,), 22: (1,), 23: (5,), 24: (4, 3, 1), 25: (3,),
+    26: (6, 2, 1), 27: (5, 2, 1), 28: (3,), 29: (2,), 30: (6, 4, 1), 31: (3,),
+    32: (7, 6, 2), 33: (13,), 34: (8, 4, 3), 35: (2,), 36: (11,),
+    37: (6, 4, 1), 38: (6, 5, 1), 39: (4,), 40: (5, 4, 3), 41: (3,),
+    42: (7, 4, 3), 43: (6, 4, 3), 44: (6, 5, 2), 45: (4, 3, 1), 46: (8, 7, 6),
+    47: (5,), 48: (9, 7, 4), 49: (9,), 50: (4, 3, 2), 51: (6, 3, 1), 52: (3,),
+    53: (6, 2, 1), 54: (8, 6, 3), 55: (24,), 56: (7, 4, 2), 57: (7,),
+    58: (19,), 59: (7, 4, 2), 60: (1,), 61: (5, 2, 1), 62: (6, 5, 3), 63: (1,),
+    64: (4, 3, 1), 65: (18,), 66: (9, 8, 6), 67: (5, 2, 1), 68: (9,),
+    69: (6, 5, 2), 70: (5, 3, 1), 71: (6,), 72: (10, 9, 3), 73: (25,),
+    74: (7, 4, 3), 75: (6, 3, 1), 76: (5, 4, 2), 77: (6, 5, 2), 78: (7, 2, 1),
+    79: (9,), 80: (9, 4, 2), 81: (4,), 82: (9, 6, 4), 83: (7, 4, 2), 84: (13,),
+    85: (8, 2, 1), 86: (6, 5, 2), 87: (13,), 88: (11, 9, 8), 89: (38,),
+    90: (5, 3, 2), 91: (8, 5, 1), 92: (6, 5, 2), 93: (2,), 94: (21,),
+    95: (11,), 96: (10, 9, 6), 97: (6,), 98: (11,), 99: (7, 5, 4), 100: (37,),
+    101: (7, 6, 1), 102: (6, 5, 3), 103: (9,), 104: (11, 10, 1), 105: (16,),
+    106: (15,), 107: (9, 7, 4), 108: (31,), 109: (5, 4, 2), 110: (6, 4, 1),
+    111: (10,), 112: (11, 6, 4), 113: (9,), 114: (11, 2, 1), 115: (8, 7, 5),
+    116: (6, 5, 2), 117: (5, 2, 1), 118: (33,), 119: (8,), 120: (9, 6, 2),
+    121: (18,), 122: (6, 2, 1), 123: (2,), 124: (37,), 125: (7, 6, 5),
+    126: (7, 4, 2), 127: (1,), 128: (7, 2, 1)
+}
+
+def is_primitive(p):
+    return Polynomial.from_mask(p).is_primitive()
+
+def primitive_polynomial(deg, factors=None):
+    """from primitive_taps, other degrees are searched and registered;
+    factors: the prime factors of 2^deg - 1 if rho cannot find them"""
+    if deg not in primitive_taps:
+        f = Polynomial.find(deg, primitive=True, factors=factors).c
+        primitive_taps[deg] = tuple(t for t in range(deg - 1, 0, -1) if f >> t & 1)
+    p = (1 << deg) | 1
+    for t in primitive_taps[deg]:
+        p |= 1 << t
+    return p
+
+_classes = {LFSR16.p: LFSR16}  # p -> LFSR class
+def lfsr_class(deg, p=None, factors=None):
+    """LFSR class over p, by default the primitive polynomial of deg;
+    deg may be None if p is given. factors as for primitive_polynomial"""
+    if p:
+        if deg is None:
+            deg = p.bit_length() - 1
+        elif deg != p.bit_length() - 1:
+            raise ValueError("p is not of degree {}".format(deg))
+    p = p or primitive_polynomial(deg, factors)
+    if p not in _classes:
+        _classes[p] = type("LFSR{}".format(deg), (LFSR,), dict(p=p))
+    return _classes[p]
+
+
 from random import getrandbits as grb
 def test():
     F = LFSR16
-    mtable = mult_table(F)
     X = grb(F.p.bit_length() - 1)        
     a = F(1)
     a.shift('r')
-    a.mult_table = mtable
     a = a ** X
 
     b = F(1)
     b.shift('l')
-    b.mult_table = mtable
     b = b ** X
 
     assert (a*b).value == 1
-test_pow()
+    assert F.mult_table is F(1).mult_table is tables(F.p)['mult_table']
+
+if __name__ == "__main__":
+    import sys
+    if len(sys.argv) > 1:
+        if   sys.argv[1] == '-v':
+            import doctest
+            doctest.testmod()
+            test()
+        elif sys.argv[1] == '-h':
+            print("Use -v  to run self-test")
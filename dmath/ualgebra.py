@@ -2,6 +2,7 @@
 """ Vector Spaces, Finite Fields and Matrices
  class PrimeField is defined by its prime 'base'
   >>> class Z3(PrimeField):
+  ...     __slots__ = ()
   ...     base = 3
   >>> Z3(2)+Z3(2)
   Z3(1)
@@ -52,6 +53,72 @@
   >>> a = F27(0x29); b = F27(0x10)
   >>> print (a == b.inv())
   True
+
+  Fields of at most 2^16 elements multiply, invert and divide by
+  log/exp tables built on first use, also elementwise over arrays;
+  a reducible p keeps the generic arithmetic of the ring
+  >>> a, b = F8(0x53), F8(0xca)
+  >>> F8.generator(), F8(3) ** 255 == F8(1), a ** -1 == b, a / b == a * a
+  (3, True, True, True)
+  >>> x = np.array([0x53, 0, 2], dtype=np.uint8)
+  >>> F8.mul_array(x, 0xca).tolist(), F8.pow_array(x, 2).tolist()
+  ([1, 0, 143], [181, 0, 4])
+  >>> class R4(ExtentionField):
+  ...     BaseF, p = Z2, [1, 0] # x^2 + 1 = (x + 1)^2
+  >>> (R4(1) * R4(1)).value, (R4(3) * R4(3)).value, R4._tabled()
+  (1, 0, False)
+  >>> F16 = extension_field(Polynomial([1, 0, 1, 1, 0, 1] + [0] * 10 + [1]))
+  >>> F16.pow_array([0x1234, 0xbeef, 7], 60000).tolist() == [
+  ...     (F16(v) ** 60000).value for v in (0x1234, 0xbeef, 7)]
+  True
+
+ class Polynomial over a PrimeField, packed: over Z2 an int of bits
+ (Karatsuba carry-less products), otherwise an array of residues 
+ (Kronecker substitution); divmod, gcd, pow(f, e, m), Rabin's 
+ irreducibility test, primitivity, and a search for both
+  >>> f = F8.polynomial(); print(f)
+  x^8 + x^4 + x^3 + x + 1
+  >>> f.is_irreducible(), f.is_primitive(), F27.is_field()
+  (True, False, True)
+  >>> g = Polynomial([2, 1, 1], Z3); print(g * g, '|', divmod(g * g + 1, g))
+  x^4 + 2x^3 + 2x^2 + x + 1 | (Polynomial([2, 1, 1], Z3), Polynomial([1], Z3))
+  >>> h = Polynomial.from_mask(0x11b); print(h, '|', g * 4 == g, h * 3 == h)
+  x^8 + x^4 + x^3 + x + 1 | True True
+  >>> print(Polynomial.find(64, primitive = True))
+  x^64 + x^4 + x^3 + x + 1
+  >>> F9 = extension_field(Polynomial.find(2, Z3, primitive = True))
+  >>> F9.__name__, F9.p, F9.generator() == 1 << Z3.bit_capacity()
+  ('F3_2', [2, 1], True)
+
+ class BinaryField, an ExtentionField over Z2 computing on integers:
+ carry-less products, sparse reduction, Itoh-Tsujii inversion.
+ F128 is GCM's field in its bit-reflected block convention, 
+ F255 a trinomial field
+  >>> from random import getrandbits as grb
+  >>> a = F128(grb(128)); b = F255(grb(255))
+  >>> a * a.inv() == F128(1), b / b.square(3) == b ** -7, F255.is_field()
+  (True, True, True)
+  >>> h = bytes.fromhex('66e94bd4ef8a2c3b884cfa59ca342b2e')
+  >>> c = bytes.fromhex('0388dace60b6a392f328c2b971b2fe78')
+  >>> ghash(h, b'', c).hex()
+  'f38cbb1ad69223dcc3457ae5b6b0f885'
+  
+  BinaryField elements are vectors over Z2, e.g., multiplication by a 
+  as a Matrix
+  >>> L = Matrix([a * v for v in F128.basis()], F128).transposed()
+  >>> v = F128(grb(128)); L * v == a * v
+  True
+
+ Small fields and spaces cache their elements, and add and multiply 
+ tables, as read-only arrays indexed by values. ddt and lat evaluate
+ the difference distribution and linear approximation tables of a 
+ function given by an array of values, or a callable on elements
+  >>> int(F8.add_table()[0x53, 0xca]), int(F8.mul_table()[0x53, 0xca]), len(F8.elements())
+  (153, 1, 256)
+  >>> sbox = F8.pow_array(F8.values(), 254) #the AES S-box without its affine part
+  >>> D, L = F8.ddt(sbox), F8.lat(sbox)
+  >>> int(D[1:].max()), int(abs(L[1:, 1:]).max()), bool(F8.ddt(lambda x: x ** 254)[1:].max() == 4)
+  (4, 16, True)
  
  class Matrix, each matrix from a 'Domain' to a 'Range'
   is defined by a list of its rows (vectors of the Domain).
@@ -79,14 +146,72 @@
   True True
   >>> import random as r
   >>> M = RandomMatrix(V16, r) #Random Invertible Matrix
+  >>> v = np.arange(16, dtype=np.uint64) #apply_many, all images at once
+  >>> M.apply_many(v).tolist() == [(M*V16(int(i))).value for i in v]
+  True
+  >>> A.apply_many([V27([1,1,1]).value, V27([0,2,0]).value]).tolist()
+  [32, 41]
+  >>> P, Q = random_invertible(V27, rng = 1, inverse = True); P*Q == I
+  True
+
+  Elimination: rank, det, kernel and solve share a cached decomposition
+  >>> S = Matrix([[1,2,0],[2,1,0],[0,0,1]], V27)
+  >>> S.rank(), S.det(), A.det(), [v.coords() for v in S.kernel()]
+  (2, Z3(0), Z3(2), [[1, 1, 0]])
+  >>> b = S*V27([2,0,1]); S*S.solve(b) == b
+  True
+  >>> S.solve_many([b.value, V27([1,0,0]).value])
+  Traceback (most recent call last):
+  ...
+  ValueError: No solution
+  >>> len(random_invertible(V16, count = 3, rng = 1))
+  3
+
+ class GF2Matrix, a matrix over Z2 with rows packed into uint64 words.
+  Multiplication is by the Method of Four Russians, rank, inverse
+  and solve by word-parallel Gaussian elimination. 
+  Conversion to and from Matrix is lossless
+  >>> G = GF2Matrix.from_matrix(M)
+  >>> G.to_matrix(V16) == M, G.shape, G.rank()
+  (True, (4, 4), 4)
+  >>> G * G.inv() == GF2Matrix.identity(4), G.inv().to_matrix(V16) == M.inv()
+  (True, True)
+  >>> G.apply(G.solve(0b1011))
+  11
+  >>> A = GF2Matrix.from_rows([0b011, 0b110], 3); print(A.transposed())
+  [10,
+   11,
+   01]
+  >>> W, X = GF2Matrix.random_invertible(64, count = 1000, rng = 1, inverse = True)
+  >>> W.shape, GF2Matrix(W[7], 64) * GF2Matrix(X[7], 64) == GF2Matrix.identity(64)
+  ((1000, 64, 1), True)
 """
-from itertools import chain, repeat, zip_longest
+from functools import lru_cache
+from itertools import chain, repeat
 from operator import itemgetter, attrgetter
-from uutils.dmath.unumbers import inverse
+import numpy as np
+from uutils.dmath.unumbers import inverse, factor
+from numba import jit
+from uutils.dmath.ubits import clmul, hw_array, walsh_hadamard
+
+def _class_table(cls, name, build):
+    "a read-only array built on first use, cached per class"
+    if name not in cls.__dict__:
+        t = build()
+        t.flags.writeable = False
+        setattr(cls, name, t)
+    return cls.__dict__[name]
+
+def _small_table(cls, name, build):
+    "_class_table, for classes of at most cls.table_bits bits"
+    if name not in cls.__dict__ and cls.bit_capacity() > cls.table_bits:
+        raise ValueError("No tables above {} bits".format(cls.table_bits))
+    return _class_table(cls, name, build)
 
 class PrimeField(object):
     "Defined by a prime number 'base'"
     base = None #abstract class
+    __slots__ = ('value',)
     def __init__(self, v):
         if type(v) == type(self): 
             self.value = v.value
@@ -95,13 +220,34 @@ class PrimeField(object):
     @classmethod
     def bit_capacity(self):
         return (self.base-1).bit_length()
-    #@classmethod
-    #def overZ2(self):
-    #    return self.base == 2
+    @classmethod
+    def overZ2(self):
+        return self.base == 2
     @classmethod
     def iter(self):
         'all elements of the field'
         return range(self.base)
+    @classmethod
+    def elements(cls):
+        "cached tuple of all elements, shared: do not modify in place"
+        if '_elements_table' not in cls.__dict__:
+            cls._elements_table = tuple(cls(v) for v in cls.iter())
+        return cls._elements_table
+    table_bits = 8 #add and mul tables are built up to this bit capacity
+    @classmethod
+    def add_table(cls):
+        "[a, b] -> a + b"
+        def build():
+            v = np.arange(cls.base, dtype=np.min_scalar_type(2 * cls.base))
+            return (np.add.outer(v, v) % cls.base).astype(np.min_scalar_type(cls.base))
+        return _small_table(cls, '_add_table', build)
+    @classmethod
+    def mul_table(cls):
+        "[a, b] -> a * b"
+        def build():
+            v = np.arange(cls.base, dtype=np.uint64)
+            return (np.multiply.outer(v, v) % cls.base).astype(np.min_scalar_type(cls.base))
+        return _small_table(cls, '_mul_table', build)
     def __repr__(self):
         return f'{type(self).__name__}({self.value})'
     def __str__(self):
@@ -144,6 +290,7 @@ class PrimeField(object):
         
 class Z2(PrimeField):
     base = 2
+    __slots__ = ()
     def __add__(self, other):
         if type(other) == Z2:
             return Z2(self.value ^ other.value)
@@ -171,15 +318,40 @@ class Z2(PrimeField):
     __isub__ = __iadd__
     def __repr__(self):
         return f'{self.value}'
+    __str__ = __repr__
     @classmethod
     def overZ2(self):
         return True    
 
+@lru_cache(maxsize=None)
+def _swar_masks(q, n, k):
+    """masks for k coordinates mod q, n bits each, split into the even
+    and the odd ones, each in a 2n-bit slot: 
+    (coordinate mask, 1, q, 2^n-q per slot)"""
+    ones = sum(1 << (2*n*i) for i in range((k + 1) // 2))
+    return ((1 << n) - 1) * ones, ones, q * ones, ((1 << n) - q) * ones
+
+def _swar_reduce(s, q, n, ones, c):
+    "s - q in every slot of s that is >= q; slots shall be < 2q"
+    return s - q * (((s + c) >> n) & ones)
+
+def _swar_add_array(a, b, q, k):
+    "_add_values over uint64 arrays of k coordinates mod q"
+    n = (q - 1).bit_length()
+    m, ones, _, c = (np.uint64(x) for x in _swar_masks(q, n, k))
+    q, n = np.uint64(q), np.uint64(n)
+    even = _swar_reduce((a & m) + (b & m), q, n, ones, c)
+    odd = _swar_reduce(((a >> n) & m) + ((b >> n) & m), q, n, ones, c)
+    return even | (odd << n)
+
 class VectorSpace(object):
     """An abstract class for vector spaces over various fields.
      A vector is a LE list of elements of its base field.
-     Any derived class shall define its 'BaseF' and 'dimension'"""
+     Any derived class shall define its 'BaseF' and 'dimension'.
+     Over odd primes the coordinates are added, negated and scaled 
+     in place within the packed value (SWAR)"""
     BaseF, dimension = None, None #abstract class
+    __slots__ = ('value',)
     def __init__(self, v):
         if hasattr(v, 'value'): 
             self.value = v.value
@@ -202,12 +374,126 @@ class VectorSpace(object):
     def basis(self):
         'iterator'
         v = 1
-        for i in range(self.dimension):
+        for i in range(self.dim()):
             yield self(v)
             v <<= self.BaseF.bit_capacity()
     @classmethod
     def overZ2(self):
         return self.BaseF.overZ2()
+    def coords(self):
+        "LE list of the coordinates as int"
+        n = self.BaseF.bit_capacity()
+        m = (1 << n) - 1
+        return [(self.value >> (n*i)) & m 
+                for i in range(max(self.dim(), -(-self.value.bit_length() // n)))]
+    table_bits = 8 #add and mul tables are built up to this bit capacity
+    @classmethod
+    def values(cls):
+        "read-only array of the values of all elements, increasing"
+        return _class_table(cls, '_values', lambda: np.array(
+            list(cls._elements()), dtype=np.min_scalar_type((1 << cls.bit_capacity()) - 1)))
+    @classmethod
+    def elements(cls):
+        "cached tuple of all elements, shared: do not modify in place"
+        if '_elements_table' not in cls.__dict__:
+            cls._elements_table = tuple(cls(int(v)) for v in cls.values())
+        return cls._elements_table
+    @classmethod
+    def _add_values_array(cls, a, b):
+        "a + b over arrays of values"
+        a, b = np.broadcast_arrays(np.asarray(a, dtype=np.uint64), 
+                                   np.asarray(b, dtype=np.uint64))
+        if cls.overZ2():
+            return a ^ b
+        return _swar_add_array(a, b, cls.BaseF.base, cls.dim())
+    @classmethod
+    def add_table(cls):
+        "[a, b] -> a + b, indexed by values"
+        def build():
+            v = np.arange(1 << cls.bit_capacity())
+            return cls._add_values_array(v[:, None], v[None, :]).astype(cls.values().dtype)
+        return _small_table(cls, '_add_table', build)
+    @classmethod
+    def neg_table(cls):
+        "[a] -> -a, indexed by values"
+        return _small_table(cls, '_neg_table', lambda: np.array(
+            [cls._neg_value(v) if not cls.overZ2() else v 
+             for v in range(1 << cls.bit_capacity())], dtype=cls.values().dtype))
+    @classmethod
+    def _lookup(cls, f, Range):
+        "values of f at all values of cls: an array indexed by values, or a callable"
+        if not callable(f):
+            return np.asarray(f, dtype=np.int64)
+        res = np.zeros(1 << cls.bit_capacity(), dtype=np.int64)
+        for x in cls.elements():
+            y = f(x)
+            res[x.value] = getattr(y, 'value', y)
+        return res
+    @classmethod
+    def ddt(cls, f, Range = None):
+        """difference distribution table of f from cls to Range:
+        [a, b] -> #{x: f(x + a) - f(x) = b}, indexed by values"""
+        Range = Range or cls
+        S, x = cls._lookup(f, Range), cls.values().astype(np.int64)
+        n, m = 1 << cls.bit_capacity(), 1 << Range.bit_capacity()
+        if cls.overZ2() and Range.overZ2():
+            d = S[x[None, :] ^ x[:, None]] ^ S[x][None, :]
+        else:
+            d = Range.add_table()[S[cls.add_table()[x][:, x]], 
+                                  Range.neg_table()[S[x]][None, :]]
+        d = (x[:, None] * m + d).ravel()
+        return np.bincount(d, minlength=n * m).reshape(n, m)
+    @classmethod
+    def lat(cls, f, Range = None):
+        """linear approximation table of f from cls to Range over Z2:
+        [a, b] -> #{x: a.x = b.f(x)} - 2^(n-1), by a Walsh-Hadamard 
+        transform for each output mask b"""
+        Range = Range or cls
+        if not (cls.overZ2() and Range.overZ2()):
+            raise TypeError("LAT is defined over Z2")
+        S = cls._lookup(f, Range).astype(np.uint64)
+        b = np.arange(1 << Range.bit_capacity(), dtype=np.uint64)
+        signs = 1 - 2 * (hw_array(b[:, None] & S[None, :]) & 1).astype(np.int64)
+        return walsh_hadamard(signs, axis=1).T // 2
+    @classmethod
+    def _elements(cls, bits = None):
+        "values of all elements (of the low bits coordinates), increasing"
+        q, n = cls.BaseF.base, cls.BaseF.bit_capacity()
+        m = (1 << n) - 1
+        bits = cls.bit_capacity() if bits is None else bits
+        for v in range(1 << bits):
+            if all((v >> (n*i)) & m < q for i in range(-(-bits // n))):
+                yield v
+    @classmethod
+    def _packed(self, a, b = 0):
+        "(q, n, masks) for values a, b"
+        q, n = self.BaseF.base, self.BaseF.bit_capacity()
+        k = max(self.dim(), -(-max(a.bit_length(), b.bit_length()) // n))
+        return q, n, _swar_masks(q, n, k)
+    @classmethod
+    def _add_values(self, a, b):
+        q, n, (m, ones, _, c) = self._packed(a, b)
+        even = _swar_reduce((a & m) + (b & m), q, n, ones, c)
+        odd = _swar_reduce(((a >> n) & m) + ((b >> n) & m), q, n, ones, c)
+        return even | (odd << n)
+    @classmethod
+    def _neg_value(self, a):
+        q, n, (m, ones, qs, c) = self._packed(a)
+        even = _swar_reduce(qs - (a & m), q, n, ones, c)
+        odd = _swar_reduce(qs - ((a >> n) & m), q, n, ones, c)
+        return even | (odd << n)
+    @classmethod
+    def _scale_value(self, k, a):
+        "k*a by doubling and adding"
+        res = 0
+        k %= self.BaseF.base
+        while k:
+            if k & 1:
+                res = self._add_values(res, a)
+            k >>= 1
+            if k:
+                a = self._add_values(a, a)
+        return res
     def __eq__(self, other):
         return (type(self) == type(other) and
             self.value == other.value)
@@ -218,22 +504,19 @@ class VectorSpace(object):
         if self.overZ2():
             return F(self.value ^ other.value)
         else:
-            return F(i + j for i, j in zip_longest(self, other, 
-                        fillvalue = self.BaseF(0)))
+            return F(F._add_values(self.value, other.value))
     def __iadd__(self, other):
-        F = type(self) 
         if self.overZ2():
             self.value ^= other.value
         else:
-            self.value = F(i+j for i, j in zip_longest(self, other, 
-                        fillvalue = self.BaseF(0))).value
+            self.value = self._add_values(self.value, other.value)
         return self
     def __neg__(self):
         F = type(self) 
         if self.overZ2():
             return F(self)
         else:
-            return F(-i for i in self)
+            return F(F._neg_value(self.value))
     def __sub__(self, other):
         return self + (-other)
     def __isub__(self, other):
@@ -260,15 +543,18 @@ class VectorSpace(object):
         return ' '.join(str(i) for i in self)
     def __mul__(self, other):
         "scalar product"
-        return sum((i*j for i,j in zip(self,other)), self.BaseF(0))
+        if self.overZ2():
+            return self.BaseF(bin(self.value & other.value).count('1'))
+        return self.BaseF(sum(i*j for i,j in zip(self.coords(), other.coords())))
     def __rmul__(self, other):
         if type(other) == self.BaseF:
-            return type(self)(other*i for i in self)
+            if self.overZ2():
+                return type(self)(self.value if other.value else 0)
+            return type(self)(self._scale_value(other.value, self.value))
         else: 
             return NotImplemented
     def __imul__(self, other):
-        self.value = type(self)(
-            other*i for i in self).value
+        self.value = (other * self).value
         return self
 
     
@@ -277,16 +563,140 @@ class ExtentionField(VectorSpace):
      base field 'BaseF', e.g., Z2 and the extension polinomial
      e.g, [1,1,0,1,1,0,0,0] for Rijndael's field """
     BaseF, p = None, None #abstract class
+    __slots__ = ()
     def __init__(self, v):
         VectorSpace.__init__(self, v)
+    table_limit = 1 << 16 #fields up to this order use log/exp tables
     @classmethod
     def dim(self):
         return len(self.p)
+    @classmethod
+    def polynomial(self):
+        "x^dim + p"
+        return Polynomial(list(self.p) + [1], self.BaseF)
+    @classmethod
+    def is_field(self):
+        return self.polynomial().is_irreducible()
+    @classmethod
+    def _is_field(cls):
+        "is_field, cached per class"
+        if '_field' not in cls.__dict__:
+            cls._field = cls.is_field()
+        return cls._field
+    @classmethod
+    def order(self):
+        return self.BaseF.base ** self.dim()
+    @classmethod
+    def _mul_values(cls, a, b):
+        "product of two values, used to build the tables"
+        d = cls.dim()
+        if cls.BaseF.base == 2:
+            r, poly = clmul(a, b), sum(v << i for i, v in enumerate(cls.p))
+            for k in range(r.bit_length() - 1, d - 1, -1):
+                if (r >> k) & 1:
+                    r ^= (poly << (k - d)) ^ (1 << k)
+            return r
+        q, n = cls.BaseF.base, cls.BaseF.bit_capacity()
+        m = (1 << n) - 1
+        u = [(a >> (n*i)) & m for i in range(d)]
+        v = [(b >> (n*i)) & m for i in range(d)]
+        c = [0] * (2*d - 1)
+        for i, x in enumerate(u):
+            if x:
+                for j, y in enumerate(v):
+                    c[i+j] += x*y
+        for k in range(2*d - 2, d - 1, -1):
+            t, c[k] = c[k] % q, 0
+            for i, x in enumerate(cls.p):
+                c[k-d+i] -= t*x
+        return sum((x % q) << (n*i) for i, x in enumerate(c[:d]))
+    @classmethod
+    def generator(cls):
+        "the least primitive element"
+        if not cls._is_field():
+            raise ValueError("{} is not a field".format(cls.__name__))
+        if '_generator' not in cls.__dict__:
+            q, f, r, factors = cls.order() - 1, 2, cls.order() - 1, []
+            while f * f <= r:
+                if r % f == 0:
+                    factors.append(f)
+                    while r % f == 0:
+                        r //= f
+                f += 1
+            if r > 1:
+                factors.append(r)
+            def power(a, e):
+                res = 1
+                while e:
+                    if e & 1:
+                        res = cls._mul_values(res, a)
+                    a, e = cls._mul_values(a, a), e >> 1
+                return res
+            cls._generator = next(g for g in cls._elements() if g > 1 and 
+                all(power(g, q // f) != 1 for f in factors)) if q > 1 else 1
+        return cls._generator
+    @classmethod
+    def tables(cls):
+        """(log, exp) arrays, built on first use. exp is extended so
+        that log[a] + log[b] needs no reduction, log[0] points past
+        the powers of the generator to a zero region of exp"""
+        if '_log' not in cls.__dict__:
+            q, g = cls.order() - 1, cls.generator()
+            dtype = np.min_scalar_type((1 << cls.bit_capacity()) - 1)
+            exp = np.zeros(4*q + 1, dtype=dtype)
+            log = np.full(1 << cls.bit_capacity(), 2*q, dtype=np.int32)
+            v = 1
+            for i in range(q):
+                exp[i] = v
+                log[v] = i
+                v = cls._mul_values(v, g)
+            exp[q:2*q] = exp[:q]
+            cls._log, cls._exp = log, exp
+            cls._logl, cls._expl = log.tolist(), exp.tolist()
+        return cls._log, cls._exp
+    @classmethod
+    def _tabled(cls):
+        "small fields use the tables, other rings the generic arithmetic"
+        return cls.order() <= cls.table_limit and cls._is_field() and (
+            '_log' in cls.__dict__ or cls.tables())
+    @classmethod
+    def mul_table(cls):
+        "[a, b] -> a * b, indexed by values"
+        def build():
+            v = np.arange(1 << cls.bit_capacity())
+            return cls.mul_array(v[:, None], v[None, :]).astype(cls.values().dtype)
+        return _small_table(cls, '_mul_table', build)
+    @classmethod
+    def mul_array(cls, a, b):
+        "elementwise product of arrays (or scalars) of values"
+        log, exp = cls.tables()
+        return exp[log[a] + log[b]]
+    @classmethod
+    def inv_array(cls, a):
+        log, exp = cls.tables()
+        a = np.asarray(a)
+        if not a.all():
+            raise ZeroDivisionError("Inverting 0?!")
+        return exp[cls.order() - 1 - log[a]]
+    @classmethod
+    def div_array(cls, a, b):
+        return cls.mul_array(a, cls.inv_array(b))
+    @classmethod
+    def pow_array(cls, a, power):
+        log, exp = cls.tables()
+        a, q = np.asarray(a), cls.order() - 1
+        if power == 0:
+            return np.ones_like(a, dtype=exp.dtype)
+        if power < 0 and not a.all():
+            raise ZeroDivisionError("Inverting 0?!")
+        return np.where(a == 0, exp[2*q], exp[(log[a].astype(np.int64) * (power % q)) % q])
     def __mul__(self,other):
         """can handle one operand of length self.dim()+1
         as used in inv"""
         F  = type(self)
         if type(other) == F:
+            if F._tabled():
+                return F(F._expl[F._logl[self.value] + F._logl[other.value]])
             BF = self.BaseF
             res = [BF(0) for i in range(self.dim()*2+1)]
             for i, v in enumerate(self):
@@ -314,6 +724,8 @@ class ExtentionField(VectorSpace):
         F = type(self)
         if self.value == 0:
             raise ZeroDivisionError("Inverting 0?!")
+        if F._tabled():
+            return F(F._expl[F.order() - 1 - F._logl[self.value]])
         BF = self.BaseF
         BFmask = (1 << BF.bit_capacity()) - 1
         x_inv  = F(self.p[1:]+[1]) #inverse of F([0,1])
@@ -340,6 +752,11 @@ class ExtentionField(VectorSpace):
     def __pow__(self, power):
         'Right-to-left'
         F = type(self)
+        if F._tabled():
+            if self.value == 0:
+                return F(0) if power > 0 else (F(1) if power == 0 else self.inv())
+            q = F.order() - 1
+            return F(F._expl[(F._logl[self.value] * power) % q])
         a, res = F(self), F(1)
         while True:
             if power & 1: #multiply
@@ -352,6 +769,7 @@ class ExtentionField(VectorSpace):
 
 class F8(ExtentionField):
     "Rijndael's Polynom 0 = X^8 + X^4 + X^3 + X + 1"
+    __slots__ = ()
     BaseF = Z2
     p = [1,1,0,1,1,0,0,0]
 
@@ -361,8 +779,372 @@ def bits(val, l):
         res[i] = val & 1
         val >>= 1
     return res
+
+
+def _clmul(a, b):
+    "carry-less product, Karatsuba above 1024 bits"
+    if min(a.bit_length(), b.bit_length()) <= 1024:
+        return clmul(a, b)
+    h = max(a.bit_length(), b.bit_length()) // 2
+    m = (1 << h) - 1
+    a0, a1, b0, b1 = a & m, a >> h, b & m, b >> h
+    lo, hi = _clmul(a0, b0), _clmul(a1, b1)
+    return lo ^ ((_clmul(a0 ^ a1, b0 ^ b1) ^ lo ^ hi) << h) ^ (hi << (2*h))
+
+def _sqr2(a):
+    "square over Z2, by spreading the bits"
+    return int('0'.join(format(a, 'b')), 2)
+
+def _dtype(q):
+    "coefficients of products stay in int64 below 2^31"
+    return np.int64 if q < 1 << 31 else object
+
+# steps of Pollard rho per factor of q^n - 1: enough for all 2^n - 1,
+# n <= 160, but n = 137 and 149
+rho_effort = 1 << 22
+
+def _cyclotomic_factors(q, n):
+    """prime factors of q^n - 1, from factors of its cyclotomic parts;
+    ValueError if one is out of reach of rho_effort"""
+    phi, res = dict(), set()
+    for d in (d for d in range(1, n + 1) if n % d == 0):
+        v = q**d - 1
+        for e in phi:
+            if d % e == 0:
+                v //= phi[e]
+        phi[d] = v
+        try:
+            res.update(factor(v, rho_effort))
+        except ValueError:
+            raise ValueError("Cannot factor {}^{} - 1, pass its prime factors "
+                             "as factors".format(q, n)) from None
+    return sorted(res)
+
+class Polynomial(object):
+    """A polynomial over a PrimeField 'F', immutable, with packed 
+     coefficients: over Z2 the bits of an int, otherwise a LE array 
+     of residues. Products are carry-less (Karatsuba for long ones) 
+     over Z2, otherwise by Kronecker substitution into an int.
+     'c' is the LE sequence of coefficients, or a constant: an int
+     is a constant over any field, f * 3 == f * F(3); from_mask 
+     builds a polynomial from the bits of an int"""
+    __slots__ = ('F', 'c')
+    def __init__(self, c, F = Z2):
+        self.F = F
+        if isinstance(c, (int, np.integer, PrimeField)):
+            c = [c]
+        if F.base == 2:
+            self.c = sum((int(getattr(v, 'value', v)) & 1) << i 
+                         for i, v in enumerate(c))
+        else:
+            c = np.array([getattr(v, 'value', v) for v in c], 
+                         dtype=_dtype(F.base)) % F.base
+            n = len(c)
+            while n and not c[n-1]:
+                n -= 1
+            self.c = c[:n]
+    @classmethod
+    def from_mask(cls, m, F = Z2):
+        "the polynomial with coefficient 1 at the bits of m, 0 elsewhere"
+        if F.base == 2:
+            f = object.__new__(cls)
+            f.F, f.c = F, m
+            return f
+        return cls(bits(m, m.bit_length()), F)
+    @classmethod
+    def monomial(cls, k, F = Z2):
+        "x^k"
+        return cls.from_mask(1 << k, F)
+    def _new(self, c):
+        "from packed coefficients"
+        if self.F.base == 2:
+            return Polynomial.from_mask(c, self.F)
+        return Polynomial(c, self.F)
+    def degree(self):
+        "-1 for 0"
+        return self.c.bit_length() - 1 if self.F.base == 2 else len(self.c) - 1
+    def coeffs(self):
+        "LE list of int coefficients"
+        if self.F.base == 2:
+            return bits(self.c, self.degree() + 1)
+        return [int(v) for v in self.c]
+    def lead(self):
+        return self.coeffs()[-1] if self.degree() >= 0 else 0
+    def __bool__(self):
+        return self.degree() >= 0
+    def __eq__(self, other):
+        if not isinstance(other, Polynomial):
+            other = Polynomial(other, self.F)
+        return self.F == other.F and self.coeffs() == other.coeffs()
+    def __ne__(self, other):
+        return not (self == other)
+    def __hash__(self):
+        return hash((self.F.base, tuple(self.coeffs())))
+    def __repr__(self):
+        return f'Polynomial({self.coeffs()}, {self.F.__name__})'
+    def __str__(self):
+        terms = [(f'{v}' if v != 1 or i == 0 else '') + 
+                 ('x' if i else '') + (f'^{i}' if i > 1 else '')
+                 for i, v in reversed(list(enumerate(self.coeffs()))) if v]
+        return ' + '.join(terms) or '0'
+    def __add__(self, other):
+        if not isinstance(other, Polynomial):
+            other = Polynomial(other, self.F)
+        if self.F.base == 2:
+            return self._new(self.c ^ other.c)
+        a, b = (self.c, other.c) if len(self.c) >= len(other.c) else (other.c, self.c)
+        a = a.copy()
+        a[:len(b)] += b
+        return self._new(a)
+    __radd__ = __add__
+    def __neg__(self):
+        return self if self.F.base == 2 else self._new(-self.c)
+    def __sub__(self, other):
+        if not isinstance(other, Polynomial):
+            other = Polynomial(other, self.F)
+        return self + (-other)
+    def __rsub__(self, other):
+        return -self + other
+    def __mul__(self, other):
+        if not isinstance(other, Polynomial):
+            other = Polynomial(other, self.F)
+        q = self.F.base
+        if q == 2:
+            if self.c == other.c:
+                return self._new(_sqr2(self.c) if self.c else 0)
+            return self._new(_clmul(self.c, other.c))
+        a, b = self.c, other.c
+        if not len(a) or not len(b):
+            return self._new([])
+        if min(len(a), len(b)) * (q - 1)**2 < 1 << 64:
+            # Kronecker substitution, one 64-bit slot per coefficient
+            x = int.from_bytes(a.astype('<u8').tobytes(), 'little')
+            y = int.from_bytes(b.astype('<u8').tobytes(), 'little')
+            n = len(a) + len(b) - 1
+            r = np.frombuffer((x*y).to_bytes(8*n, 'little'), dtype='<u8')
+            return self._new((r % np.uint64(q)).astype(_dtype(q)))
+        return self._new(np.convolve(a.astype(object), b.astype(object)) % q)
+    __rmul__ = __mul__
+    def __divmod__(self, other):
+        if not isinstance(other, Polynomial):
+            other = Polynomial(other, self.F)
+        d = other.degree()
+        if d < 0:
+            raise ZeroDivisionError("Polynomial division by 0")
+        if self.F.base == 2:
+            a, b, quo = self.c, other.c, 0
+            while a.bit_length() > d:
+                shift = a.bit_length() - 1 - d
+                quo |= 1 << shift
+                a ^= b << shift
+            return self._new(quo), self._new(a)
+        q, b = self.F.base, other.c
+        r = self.c.copy()
+        quo = np.zeros(max(len(r) - d, 0), dtype=r.dtype)
+        t = self.F(int(b[-1])).inv().value
+        for i in range(len(r) - 1 - d, -1, -1):
+            quo[i] = r[i + d] * t % q
+            if quo[i]:
+                r[i:i + d + 1] = (r[i:i + d + 1] - quo[i] * b) % q
+        return self._new(quo), self._new(r[:d])
+    def __floordiv__(self, other):
+        return divmod(self, other)[0]
+    def __mod__(self, other):
+        return divmod(self, other)[1]
+    def __pow__(self, e, m = None):
+        "self^e, mod m if given, as pow(f, e, m)"
+        res = self._new(1)
+        for bit in bin(e)[2:]:
+            res = res * res
+            if m is not None:
+                res %= m
+            if bit == '1':
+                res = res * self
+                if m is not None:
+                    res %= m
+        return res
+    def monic(self):
+        if not self:
+            return self
+        return self * self.F(self.lead()).inv().value
+    def gcd(self, other):
+        "monic gcd"
+        a, b = self, other
+        while b:
+            a, b = b, a % b
+        return a.monic()
+    def _frobenius(self, h):
+        "h^q mod self"
+        q = self.F.base
+        if q == 2:
+            return self._new(_sqr2(h.c) if h.c else 0) % self
+        return pow(h, q, self)
+    def is_irreducible(self):
+        "Rabin's test: x^(q^n) = x mod self, gcd(x^(q^(n/r)) - x, self) = 1"
+        n = self.degree()
+        if n < 1:
+            return False
+        if n == 1:
+            return True
+        if not self.coeffs()[0]:
+            return False
+        x = self.monomial(1, self.F)
+        divisors = {n // r for r in factor(n)}
+        h = x
+        for k in range(1, n + 1):
+            h = self._frobenius(h)
+            if k in divisors and self.gcd(h - x).degree() > 0:
+                return False
+        return h == x
+    def is_primitive(self, factors = None):
+        """irreducible, and x generates the multiplicative group;
+        factors are the prime factors of q^n - 1, needed when they
+        are too large for Pollard rho (see rho_effort)"""
+        if not self.is_irreducible() or not self.coeffs()[0]:
+            return False
+        q, n = self.F.base, self.degree()
+        order = q**n - 1
+        x, one = self.monomial(1, self.F), self._new(1)
+        return all(pow(x, order // r, self) != one 
+                   for r in (factors or _cyclotomic_factors(q, n)))
+    @classmethod
+    def find(cls, n, F = Z2, primitive = False, factors = None):
+        """the first monic irreducible (or primitive) polynomial of
+        degree n; over Z2 trinomials and pentanomials go first"""
+        q = F.base
+        test = ((lambda f: f.is_primitive(factors or order_factors))
+                if primitive else (lambda f: f.is_irreducible()))
+        order_factors = _cyclotomic_factors(q, n) if primitive and not factors else None
+        if q == 2:
+            top = (1 << n) | 1
+            sparse = chain(((k,) for k in range(1, n)),
+                ((a, b, c) for a in range(3, n) for b in range(2, a) 
+                 for c in range(1, b)))
+            for taps in sparse:
+                f = cls.from_mask(top | sum(1 << t for t in taps))
+                if test(f):
+                    return f
+            candidates = (bits(top | (v << 1), n + 1) for v in range(1 << (n - 1)))
+        else:
+            candidates = ([v // q**i % q for i in range(n)] + [1] 
+                          for v in range(1, q**n))
+        for c in candidates:
+            f = cls(c, F)
+            if test(f):
+                return f
   
 
+class BinaryField(ExtentionField):
+    """An ExtentionField over Z2 multiplying values as integers:
+     carry-less products, reduction by folding the bits above dim 
+     onto the taps of 'p' (fast for trinomials and pentanomials),
+     Itoh-Tsujii inversion"""
+    __slots__ = ()
+    BaseF = Z2
+    @classmethod
+    def _reducer(cls):
+        "(dim, taps, mask), cached per class"
+        if '_taps' not in cls.__dict__:
+            cls._taps = tuple(i for i, v in enumerate(cls.p) if v)
+        return cls.dim(), cls._taps, (1 << cls.dim()) - 1
+    @classmethod
+    def reduce(cls, r):
+        "r mod x^dim + p"
+        n, taps, mask = cls._reducer()
+        while r >> n:
+            hi, r = r >> n, r & mask
+            for t in taps:
+                r ^= hi << t
+        return r
+    def __mul__(self, other):
+        F = type(self)
+        if type(other) == F:
+            return F(F.reduce(_clmul(self.value, other.value)))
+        return NotImplemented
+    def square(self, k = 1):
+        "self^(2^k)"
+        F, v = type(self), self.value
+        for _ in range(k):
+            v = F.reduce(_sqr2(v)) if v else 0
+        return F(v)
+    def inv(self):
+        """Itoh-Tsujii: self^-1 = (self^(2^(n-1)-1))^2, the power by 
+        an addition chain on n-1, b_(i+j) = b_i^(2^j) * b_j"""
+        if self.value == 0:
+            raise ZeroDivisionError("Inverting 0?!")
+        b, k = self, 1 # b = self^(2^k - 1)
+        for bit in bin(self.dim() - 1)[3:]:
+            b, k = b.square(k) * b, 2 * k
+            if bit == '1':
+                b, k = b.square() * self, k + 1
+        return b.square()
+    def __pow__(self, power):
+        F = type(self)
+        if power < 0:
+            return self.inv() ** -power
+        res = F(1)
+        for bit in bin(power)[2:]:
+            res = res.square()
+            if bit == '1':
+                res = res * self
+        return res
+
+class F128(BinaryField):
+    "GCM's Polynom 0 = X^128 + X^7 + X^2 + X + 1"
+    __slots__ = ()
+    p = bits(0x87, 128)
+    _rev8 = bytes(int(format(i, '08b')[::-1], 2) for i in range(256))
+    @classmethod
+    def from_block(cls, b):
+        "GCM's convention: the first bit of the block is the coefficient of 1"
+        return cls(int.from_bytes(bytes(b).translate(cls._rev8), 'little'))
+    def to_block(self):
+        return self.value.to_bytes(16, 'little').translate(self._rev8)
+
+class F255(BinaryField):
+    "Polynom 0 = X^255 + X^52 + 1, found by Polynomial.find(255)"
+    __slots__ = ()
+    p = bits((1 << 52) | 1, 255)
+
+@jit(nopython=True)
+def _ghash_blocks(blocks, table, y):
+    "y = (y ^ block) * h for each block, 128-bit values as (lo, hi) words"
+    lo, hi = y[0], y[1]
+    for k in range(blocks.shape[0]):
+        lo ^= blocks[k, 0]
+        hi ^= blocks[k, 1]
+        rlo, rhi = np.uint64(0), np.uint64(0)
+        for i in range(8):
+            b = (lo >> np.uint64(8*i)) & np.uint64(255)
+            rlo ^= table[i, b, 0]
+            rhi ^= table[i, b, 1]
+            b = (hi >> np.uint64(8*i)) & np.uint64(255)
+            rlo ^= table[8 + i, b, 0]
+            rhi ^= table[8 + i, b, 1]
+        lo, hi = rlo, rhi
+    y[0], y[1] = lo, hi
+
+def ghash(h, a = b'', c = b''):
+    """GCM's GHASH of additional data a and ciphertext c under the key 
+    h (16 bytes each block). Multiplication by h is by tables of h 
+    times each byte of the operand: 16 lookups, no reduction"""
+    H = F128.from_block(h)
+    table = np.zeros((16, 256, 2), dtype=np.uint64)
+    for i in range(16):
+        for k in range(8):
+            v = (H * F128(1 << (8*i + k))).value
+            table[i, 1 << k] = (v & ((1 << 64) - 1), v >> 64)
+        for v in range(3, 256):
+            if v & (v - 1):
+                table[i, v] = table[i, v & (v - 1)] ^ table[i, v & -v]
+    lengths = (8 * len(a)).to_bytes(8, 'big') + (8 * len(c)).to_bytes(8, 'big')
+    data = b''.join(bytes(d) + bytes(-len(d) % 16) for d in (a, c)) + lengths
+    rev8 = np.frombuffer(F128._rev8, dtype=np.uint8)
+    blocks = rev8[np.frombuffer(data, dtype=np.uint8)].view('<u8').reshape(-1, 2)
+    y = np.zeros(2, dtype=np.uint64)
+    _ghash_blocks(blocks.astype(np.uint64), table, y)
+    return F128(int(y[0]) | (int(y[1]) << 64)).to_block()
+
 class Matrix(object):
     """Matrix is defined by a list of its rows (vectors
      of the Domain vector space , (shall be defined separately).
@@ -377,6 +1159,7 @@ class Matrix(object):
         self.rows = [Domain(v) for v in rows]
         if len(self.rows) != self.Range.dim():
             raise ValueError("wrong number of rows")
+        self._echelon = None
     def size(self):
         return (self.Range.dim(), self.Domain.dim())
     def __iter__(self):
@@ -391,6 +1174,7 @@ class Matrix(object):
         return self.rows[r]
     def __setitem__(self, r, v):
         self.rows[r] = v
+        self._echelon = None
     def columns(self):
         return zip(*self)
     def __repr__(self):
@@ -416,7 +1200,7 @@ class Matrix(object):
         return self + (-other)
     def __mul__(self, other):
         if isinstance(other, self.Domain):
-            v = (row*other for row in self)
+            v = (VectorSpace.__mul__(row, other) for row in self) #scalar products
             return self.Range(v)
         elif isinstance(other, Matrix):
             if self.Domain != other.Range:
@@ -433,6 +1217,120 @@ class Matrix(object):
             N = Matrix(rows, self.Domain, self.Range)
         else: 
             return NotImplemented
+    def apply_many(self, vectors):
+        """images of many vectors, given by their values in an ndarray
+        or a list. Over Z2 a product with a GF2Matrix, otherwise a sum 
+        of lookups in tables of images of 8-bit chunks of the vector. 
+        Returns a uint64 ndarray if values fit 64 bits, else a list"""
+        n, m = self.Domain.bit_capacity(), self.Range.bit_capacity()
+        wide = not isinstance(vectors, np.ndarray) and any(
+            int(v) >> 64 for v in vectors)
+        if self.Domain.overZ2():
+            if wide or n > 64:
+                V = GF2Matrix.from_rows(vectors, n)
+            else:
+                V = GF2Matrix(np.asarray(vectors, dtype=np.uint64).reshape(-1, 1), n)
+            res = V * GF2Matrix.from_matrix(self).transposed()
+            return res.words[:, 0] if m <= 64 else res.rows()
+        if wide or n > 64 or m > 64:
+            return [(self * self.Domain(int(v))).value for v in vectors]
+        F = self.Domain.BaseF
+        b = F.bit_capacity()
+        c = max(1, 8 // b) * b #bits per chunk
+        vectors = np.asarray(vectors, dtype=np.uint64)
+        res = np.zeros(vectors.shape, dtype=np.uint64)
+        mask = np.uint64((1 << c) - 1)
+        for shift in range(0, n, c):
+            table = np.zeros(1 << c, dtype=np.uint64)
+            for v in self.Domain._elements(min(c, n - shift)):
+                table[v] = (self * self.Domain(v << shift)).value
+            res = _swar_add_array(res, table[(vectors >> np.uint64(shift)) & mask],
+                                  F.base, self.Range.dim())
+        return res
+    def echelon(self):
+        """Gauss-Jordan decomposition T*self = R, R in reduced echelon 
+        form, cached until the rows change: a dict of 
+        'pivots' - the pivot columns, 'R' - coordinates of the nonzero 
+        rows of R, 'K' - the Matrix mapping b to the solution of 
+        self*x = b, 'Z' - rows of T that map a solvable b to 0, 'det'.
+        Over Z2 the elimination runs on a packed GF2Matrix"""
+        key = [r.value for r in self.rows]
+        if self._echelon and self._echelon['key'] == key:
+            return self._echelon
+        (m, n), F = self.size(), self.Domain.BaseF
+        if self.Domain.overZ2():
+            G = GF2Matrix.from_matrix(self)
+            A = G._augmented(GF2Matrix.identity(m))
+            pivots = A.eliminate(n)
+            nw = G.words.shape[1]
+            R = [bits(v, n) for v in GF2Matrix(A.words[:len(pivots), :nw], n).rows()]
+            T = GF2Matrix(A.words[:, nw:], m).rows()
+            det = 1
+        else:
+            q = F.base
+            rows = [r.coords()[:n] + [int(i == j) for j in range(m)] 
+                    for i, r in enumerate(self.rows)]
+            pivots, det = [], 1
+            for c in range(n):
+                r = len(pivots)
+                p = next((i for i in range(r, m) if rows[i][c]), None)
+                if p is None:
+                    continue
+                if p != r:
+                    rows[r], rows[p], det = rows[p], rows[r], -det
+                det *= rows[r][c]
+                t = F(rows[r][c]).inv().value
+                rows[r] = [x * t % q for x in rows[r]]
+                for i in range(m):
+                    if i != r and rows[i][c]:
+                        f = rows[i][c]
+                        rows[i] = [(x - f * y) % q for x, y in zip(rows[i], rows[r])]
+                pivots.append(c)
+                if len(pivots) == m:
+                    break
+            R = [row[:n] for row in rows[:len(pivots)]]
+            T = [self.Range(row[n:]) for row in rows]
+        k = len(pivots)
+        K = [0] * n
+        for i, c in enumerate(pivots):
+            K[c] = T[i]
+        self._echelon = {'key': key, 'pivots': pivots, 'R': R, 
+            'K': Matrix(K, self.Range, self.Domain),
+            'Z': Matrix(T[k:], self.Range, V2(m - k, F)) if m > k else None,
+            'det': F(det if k == n == m else 0)}
+        return self._echelon
+    def rank(self):
+        return len(self.echelon()['pivots'])
+    def det(self):
+        if self.Domain.dim() != self.Range.dim():
+            raise TypeError("Non-square Matrix has no determinant")
+        return self.echelon()['det']
+    def kernel(self):
+        "a basis of the null space, Domain vectors"
+        E, n = self.echelon(), self.Domain.dim()
+        q, pivots = self.Domain.BaseF.base, E['pivots']
+        res = []
+        for f in sorted(set(range(n)) - set(pivots)):
+            v = [0] * n
+            v[f] = 1
+            for c, row in zip(pivots, E['R']):
+                v[c] = -row[f] % q
+            res.append(self.Domain(v))
+        return res
+    def solve(self, b):
+        """x such that self*x == b, a Range vector or value;
+        raises ValueError if there is none"""
+        E = self.echelon()
+        b = self.Range(b)
+        if E['Z'] and (E['Z'] * b).value:
+            raise ValueError("No solution")
+        return E['K'] * b
+    def solve_many(self, B):
+        "solve for many values, as apply_many"
+        E = self.echelon()
+        if E['Z'] and any(int(z) for z in E['Z'].apply_many(B)):
+            raise ValueError("No solution")
+        return E['K'].apply_many(B)
     def inv(self):
         if self.Domain != self.Range:
             raise TypeError("Non-square Matrix cannot be inverted")
@@ -463,22 +1361,283 @@ class Matrix(object):
         N.rows = list(map(itemgetter(1), v))
         return N
 
+@jit(nopython=True)
+def _gf2_invert(words, n, inverses, ok):
+    "Gauss-Jordan on each of a batch of n x n packed matrices"
+    nw = words.shape[2]
+    a = np.empty((n, nw), dtype=np.uint64)
+    b = np.empty((n, nw), dtype=np.uint64)
+    for k in range(words.shape[0]):
+        a[:] = words[k]
+        b[:] = 0
+        for r in range(n):
+            b[r, r >> 6] = np.uint64(1) << np.uint64(r & 63)
+        ok[k] = True
+        for c in range(n):
+            w, bit = c >> 6, np.uint64(1) << np.uint64(c & 63)
+            p = c
+            while p < n and not a[p, w] & bit:
+                p += 1
+            if p == n:
+                ok[k] = False
+                break
+            for j in range(nw):
+                a[c, j], a[p, j] = a[p, j], a[c, j]
+                b[c, j], b[p, j] = b[p, j], b[c, j]
+            for r in range(n):
+                if r != c and a[r, w] & bit:
+                    for j in range(nw):
+                        a[r, j] ^= a[c, j]
+                        b[r, j] ^= b[c, j]
+        if ok[k]:
+            inverses[k] = b
+
+@jit(nopython=True)
+def _gf2_invert64(words, n, inverses, ok):
+    "_gf2_invert for n <= 64, rows in single words, branch-free updates"
+    one = np.uint64(1)
+    a = np.empty(n, dtype=np.uint64)
+    b = np.empty(n, dtype=np.uint64)
+    for k in range(words.shape[0]):
+        for r in range(n):
+            a[r], b[r] = words[k, r, 0], one << np.uint64(r)
+        ok[k] = True
+        for c in range(n):
+            p = c
+            while p < n and not (a[p] >> np.uint64(c)) & one:
+                p += 1
+            if p == n:
+                ok[k] = False
+                break
+            ac, bc = a[p], b[p]
+            a[p], b[p] = a[c], b[c]
+            for r in range(n):
+                m = np.uint64(0) - ((a[r] >> np.uint64(c)) & one)
+                a[r] ^= ac & m
+                b[r] ^= bc & m
+            a[c], b[c] = ac, bc
+        if ok[k]:
+            inverses[k, :, 0] = b
+
+class GF2Matrix(object):
+    """A matrix over Z2, its rows packed into uint64 words:
+     column c is bit c%64 of word c//64, as in VectorSpace values"""
+    def __init__(self, words, ncols):
+        self.words = np.asarray(words, dtype=np.uint64)
+        self.ncols = ncols
+    @classmethod
+    def zeros(cls, nrows, ncols):
+        return cls(np.zeros((nrows, (ncols + 63) // 64), dtype=np.uint64), ncols)
+    @classmethod
+    def identity(cls, n):
+        res = cls.zeros(n, n)
+        i = np.arange(n)
+        res.words[i, i >> 6] = np.uint64(1) << (i & 63).astype(np.uint64)
+        return res
+    @classmethod
+    def random_invertible(cls, n, count = None, rng = None, inverse = False):
+        """uniformly random n x n invertible matrices, by rejection of
+        singular ones; a GF2Matrix for count=None, otherwise an array of
+        count x n x words. With inverse=True, a pair with the inverses.
+        rng is a numpy Generator or a seed"""
+        rng = np.random.default_rng(rng)
+        nw = (n + 63) // 64
+        last = np.uint64((1 << (n - 64 * (nw - 1))) - 1)
+        res, inverses, found = [], [], 0
+        while found < (count or 1):
+            batch = 4 * ((count or 1) - found) + 8 # about 29% are invertible
+            words = rng.integers(0, 1 << 64, (batch, n, nw), dtype=np.uint64)
+            words[:, :, -1] &= last
+            inv = np.empty_like(words)
+            ok = np.empty(batch, dtype=np.bool_)
+            (_gf2_invert64 if nw == 1 else _gf2_invert)(words, n, inv, ok)
+            res.append(words[ok])
+            inverses.append(inv[ok])
+            found += int(ok.sum())
+        res = np.concatenate(res)[:count or 1]
+        inverses = np.concatenate(inverses)[:count or 1]
+        if count is None:
+            res, inverses = cls(res[0], n), cls(inverses[0], n)
+        return (res, inverses) if inverse else res
+    @classmethod
+    def from_rows(cls, rows, ncols):
+        "rows given by their (VectorSpace) values"
+        n = (ncols + 63) // 64
+        data = b''.join((int(r) & ((1 << ncols) - 1)).to_bytes(8 * n, 'little') 
+                        for r in rows)
+        return cls(np.frombuffer(data, dtype='<u8').reshape(-1, n).copy(), ncols)
+    @classmethod
+    def from_matrix(cls, M):
+        if not M.Domain.overZ2():
+            raise TypeError("Not a matrix over Z2")
+        return cls.from_rows((r.value for r in M), M.Domain.dim())
+    def rows(self):
+        "values of the rows"
+        return [int.from_bytes(r.tobytes(), 'little') for r in self.words]
+    def to_matrix(self, Domain = None, Range = None):
+        Domain = Domain or V2(self.ncols)
+        Range = Range or (Domain if Domain.dim() == len(self.words) 
+                          else V2(len(self.words)))
+        return Matrix(self.rows(), Domain, Range)
+    @property
+    def shape(self):
+        return (len(self.words), self.ncols)
+    def copy(self):
+        return GF2Matrix(self.words.copy(), self.ncols)
+    def __getitem__(self, rc):
+        r, c = rc
+        return int(self.words[r, c >> 6] >> np.uint64(c & 63)) & 1
+    def __eq__(self, other):
+        return (isinstance(other, GF2Matrix) and self.shape == other.shape 
+                and np.array_equal(self.words, other.words))
+    def __ne__(self, other):
+        return not (self == other)
+    def __add__(self, other):
+        return GF2Matrix(self.words ^ other.words, self.ncols)
+    __sub__ = __add__
+    def __str__(self):
+        rows = ['{:b}'.format(r).zfill(self.ncols) for r in self.rows()]
+        return '[{}]'.format(',\n '.join(reversed(rows)))
+    def bits(self):
+        "(nrows, ncols) array of 0/1"
+        b = np.unpackbits(self.words.astype('<u8').view(np.uint8), 
+                          axis=1, bitorder='little')
+        return b[:, :self.ncols]
+    @classmethod
+    def from_bits(cls, b):
+        b = np.asarray(b, dtype=np.uint8)
+        nrows, ncols = b.shape
+        padded = np.zeros((nrows, 64 * ((ncols + 63) // 64)), dtype=np.uint8)
+        padded[:, :ncols] = b
+        packed = np.packbits(padded, axis=1, bitorder='little')
+        return cls(packed.view('<u8').astype(np.uint64), ncols)
+    def transposed(self):
+        return GF2Matrix.from_bits(self.bits().T)
+    def apply(self, v):
+        "the image of a vector value v"
+        v = GF2Matrix.from_rows([v], self.ncols).words[0]
+        odd = np.bitwise_xor.reduce(self.words & v, axis=1)
+        res = 0
+        for i, w in enumerate(odd.tolist()):
+            res |= (bin(w).count('1') & 1) << i
+        return res
+    def __mul__(self, other):
+        "Method of Four Russians, 8 rows of other at a time"
+        if not isinstance(other, GF2Matrix):
+            return NotImplemented
+        if self.ncols != len(other.words):
+            raise TypeError("Wrong Matrix multiplication")
+        m, k = self.shape
+        B = other.words
+        res = np.zeros((m, B.shape[1]), dtype=np.uint64)
+        A = np.ascontiguousarray(self.words.astype('<u8')).view(np.uint8)
+        table = np.zeros((256, B.shape[1]), dtype=np.uint64)
+        for g in range((k + 7) // 8):
+            # table[i] is the sum of rows 8g+j of B for bits j of i
+            for j in range(min(8, k - 8 * g)):
+                table[1 << j:2 << j] = table[:1 << j] ^ B[8 * g + j]
+            res ^= table[A[:, g]]
+            table[:] = 0
+        return GF2Matrix(res, other.ncols)
+    def eliminate(self, ncols = None):
+        """Gauss-Jordan elimination in place over the first ncols columns;
+        returns the pivot columns"""
+        words, pivots, r = self.words, [], 0
+        for c in range(self.ncols if ncols is None else ncols):
+            if r == len(words):
+                break
+            w, b = c >> 6, np.uint64(1) << np.uint64(c & 63)
+            nz = np.flatnonzero(words[r:, w] & b)
+            if not len(nz):
+                continue
+            if nz[0]:
+                words[[r, r + nz[0]]] = words[[r + nz[0], r]]
+            mask = (words[:, w] & b) != 0
+            mask[r] = False
+            words[mask, w:] ^= words[r, w:]
+            pivots.append(c)
+            r += 1
+        return pivots
+    def rank(self):
+        return len(self.copy().eliminate())
+    def _augmented(self, other):
+        "[self | other] with other starting at a word boundary"
+        return GF2Matrix(np.hstack((self.words, other.words)), 
+                         64 * self.words.shape[1] + other.ncols)
+    def inv(self):
+        n = len(self.words)
+        if self.ncols != n:
+            raise TypeError("Non-square Matrix cannot be inverted")
+        M = self._augmented(GF2Matrix.identity(n))
+        if len(M.eliminate(n)) != n:
+            raise ZeroDivisionError
+        return GF2Matrix(M.words[:, self.words.shape[1]:], n)
+    def solve(self, b):
+        """x such that self.apply(x) == b, for a vector value b; 
+        raises ValueError if there is none"""
+        M = self._augmented(GF2Matrix.from_bits(
+            [[(b >> i) & 1] for i in range(len(self.words))]))
+        pivots = M.eliminate(self.ncols)
+        rhs = (M.words[:, self.words.shape[1]] & np.uint64(1)).tolist()
+        if any(rhs[len(pivots):]):
+            raise ValueError("No solution")
+        return sum(v << p for p, v in zip(pivots, rhs))
+
+
+def extension_field(f):
+    "the ExtentionField defined by a Polynomial f"
+    f = f.monic()
+    class F(ExtentionField):
+        __slots__ = ()
+        BaseF = f.F
+        p = f.coeffs()[:-1]
+    F.__name__ = 'F{}_{}'.format(f.F.base, f.degree())
+    return F
+
 def V2(n, F = Z2):
     class V(VectorSpace):
+        __slots__ = ()
         dimension = n
         BaseF = F
     return V
     
+def random_invertible(V, count = None, rng = None, inverse = False):
+    """Uniformly random invertible matrices over V: a Matrix for 
+    count=None, otherwise a list; with inverse=True, (M, M.inv()) pairs.
+    Over Z2 see GF2Matrix.random_invertible, otherwise each row is 
+    drawn until it is out of the span of the previous ones.
+    rng is a numpy Generator or a seed"""
+    rng = np.random.default_rng(rng)
+    n = V.dim()
+    if V.overZ2():
+        M, N = GF2Matrix.random_invertible(n, count or 1, rng, True)
+        res = [(GF2Matrix(a, n).to_matrix(V), GF2Matrix(b, n).to_matrix(V)) 
+               for a, b in zip(M, N)]
+    else:
+        q, res = V.BaseF.base, []
+        for _ in range(count or 1):
+            rows, echelon = [], {} #pivot: row with 1 at the pivot
+            while len(rows) < n:
+                v = rng.integers(0, q, n).tolist()
+                u = list(v)
+                for p, e in echelon.items():
+                    if u[p]:
+                        u = [(x - u[p] * y) % q for x, y in zip(u, e)]
+                p = next((i for i, x in enumerate(u) if x), None)
+                if p is not None:
+                    t = V.BaseF(u[p]).inv().value
+                    echelon[p] = [x * t % q for x in u]
+                    rows.append(v)
+            M = Matrix([V(v) for v in rows], V)
+            res.append((M, M.inv() if inverse else None))
+    if not inverse:
+        res = [M for M, _ in res]
+    return res if count else res[0]
+
 def RandomMatrix(V, r):
-    '''Random Invertible Matrix over V,
-        r is used for shuffle'''
-    I = Matrix(V.basis(), V)
-    X = I + Matrix([0]+I.rows[:-1], V)
-    M = I
-    for i in range(3):
-        r.shuffle(M.rows)
-        M = X*M
-    return M.inv()
+    '''Uniformly random invertible matrix over V,
+        seeded from r, e.g., the random module'''
+    return random_invertible(V, rng = r.getrandbits(64))
     
 if __name__ == "__main__":
     import sys
@@ -1,6 +1,6 @@
 """operations with bits
- hw(x): hamming weight of 32 LS bits of x  
-  x may be an object with 'value' or an iterable.
+ hw(x): hamming weight of x  
+  x may be an object with 'value', an iterable or a numpy array.
   >>> hw32(0x12345) == 7
   True
   >>> hw64(0x1234512345) == 14
@@ -9,6 +9,23 @@
   True
   >>> hw([0x1234, 5]) == 7
   True
+  >>> hw(0x1234512345) == 14
+  True
+  >>> hw(np.array([1, 3, 7])), hw(np.array([-1], dtype=np.int8))
+  (6, 8)
+
+ hw_array(a): element-wise hamming weights of a uint8/16/32/64 array
+  >>> hw_array(np.array([0, 7, 0xffff], dtype=np.uint16)).tolist()
+  [0, 3, 16]
+
+ walsh_hadamard(a, axis=-1): the unnormalized Walsh-Hadamard transform
+ along an axis of length 2^n, by n vectorized butterfly passes
+  >>> walsh_hadamard([1, -1, -1, 1]).tolist()
+  [0, 0, 0, 4]
+
+ hw_bigint(x): hamming weight of an arbitrary long integer
+  >>> hw_bigint((1 << 1000) - 1)
+  1000
 
  lsw(x, n=0): the n-th least significant word of x
   >>> lsw(0x123456789a) == 0x3456789a
@@ -26,6 +43,10 @@
   >>> lb(0x1230) == 0x10
   True
 
+ clmul(a, b): carry-less product, i.e. of polynomials over GF(2)
+  >>> hex(clmul(0x53, 0xca))
+  '0x3f7e'
+
  bits: a class for operations with bits
   bits(x, bitlength): bitstring object. 
   may be initilized by  
@@ -51,6 +72,23 @@
    >>> list(bits('0abcdef').stream(12))
    [bits(0x0, 12), bits(0xabc, 12), bits(0xdef, 12)]
 
+  bits.stream(chunk_length, lazy=True): the same, as a generator
+   >>> next(bits('0abcdef').stream(12, lazy=True))
+   bits(0x0, 12)
+
+  chunks(source, chunk_length): lazily streams chunks of a source
+   int, str, bytes, bits are chunked as by bits.stream, 
+   >>> list(chunks(bytes.fromhex('abcdef'), 20))
+   [bits(0xa, 20), bits(0xbcdef, 20)]
+
+   a file or an iterator over bytes is chunked from the MSB, 
+   the last chunk may be shorter
+   >>> from io import BytesIO
+   >>> list(chunks(BytesIO(bytes.fromhex('abcdef')), 20))
+   [bits(0xabcde, 20), bits(0xf, 4)]
+   >>> list(chunks(iter([b'\x12', b'\x34\x56']), 12))
+   [bits(0x123, 12), bits(0x456, 12)]
+
    >>> str(bits('abcdef'))
    'abcdef'
    >>> repr(bits('bcdef'))
@@ -72,6 +110,26 @@
    >>> bits('1d2c3a4f').swap_bytes()
    bits(0x4f3a2c1d, 32)
 
+ BitArray: a bitstring backed by a numpy uint8 buffer
+  in the layout of bits.as_bytes(), i.e. MSB first.
+  Initialized as bits, or by a buffer (bytes, bytearray, ndarray) 
+  without copying; bits are indexed from the MSB.
+   >>> a = BitArray(bits('0abcdef'))
+   >>> a
+   BitArray(0xabcdef, 28)
+   >>> a[4:16]
+   BitArray(0xabc, 12)
+   >>> a.stream(12).tolist()
+   [0, 2748, 3567]
+
+  slices are views, in-place operations modify the underlying buffer
+   >>> a[4:16] ^= bits('fff')
+   >>> a[-8:] >>= 4
+   >>> a
+   BitArray(0x543d0e, 28)
+   >>> a.to_bits()
+   bits(0x543d0e, 28)
+
  Iterators:
   for a 32-bit integer, iterate:
    over bytes in BE order
@@ -99,6 +157,18 @@
    >>> it = n2words_le(0x1234567890, 3)
    >>> list(it) == [0x34567890,0x12,0]
    True
+
+  array versions take an array of words (or a bytes buffer 
+  of LE words) and return the whole result as a numpy array
+   >>> bytes_be_array([0x12345678, 0x9abcdef0]).tolist() == (
+   ...     list(bytes_be(0x12345678)) + list(bytes_be(0x9abcdef0)))
+   True
+   >>> nibbles_le_array(b'\x78\x56\x34\x12').tolist()
+   [8, 7, 6, 5, 4, 3, 2, 1]
+   >>> [hex(w) for w in bytes2words_array([0x44,0x5E,0x46,0x76,0x4A,0x05])]
+   ['0x76465e44', '0x54a']
+   >>> n2words_le_array(0x1234567890, 3).tolist() == [0x34567890,0x12,0]
+   True
  
  masks(m, n): iterates through numbers with m out of n bits set
   >>> list(masks(2, 3))
@@ -110,6 +180,29 @@
   >>> list(products(2,3))[:7]
   [(3, 0), (3, 1), (3, 2), (3, 3), (5, 0), (5, 1), (5, 4)]
 
+ mask_rank(mask), mask_unrank(r, m, n): the index of a mask in masks(m, n)
+  >>> mask_rank(6), mask_unrank(2, 2, 3)
+  (2, 6)
+
+ product_rank(mask, v), product_unrank(r, subdim, dim): the same for products
+  >>> product_rank(5, 4), product_unrank(6, 2, 3)
+  (6, (5, 4))
+
+ masks and products may start and stop at any index,
+ and may yield numpy uint64 batches:
+  >>> list(masks(2, 3, 1))
+  [5, 6]
+  >>> list(products(2, 3, 5, 7))
+  [(5, 1), (5, 4)]
+  >>> [b.tolist() for b in masks(2, 4, 1, 5, batch=3)]
+  [[5, 6, 9], [10]]
+
+ map_shards(worker, generator, m, n, processes=None, nshards=None):
+  worker(generator(m, n, start, stop)) in a process pool over shards.
+  worker shall be picklable, e.g., a module level function.
+  >>> shards(10, 3)
+  [(0, 4), (4, 7), (7, 10)]
+
  class Permutation: for shuffling according to list-defined perm. 
     >>> a = Permutation([1,3,2,0])
     >>> b = Permutation([1,0,3,2])
@@ -121,12 +214,52 @@
     >>> a*(~a)
     0,1,2,3
 
-TBD: tests for Plain, Flip, Deal, Shuffler
+    backed by an index array, it permutes numpy arrays at once
+    (along the last axis)
+    >>> a(np.array([[10, 11, 12, 13], [20, 21, 22, 23]])).tolist()
+    [[11, 13, 12, 10], [21, 23, 22, 20]]
+    >>> Permutation([1,2,0,4,3]).cycles()
+    [(0, 1, 2), (3, 4)]
+    >>> Permutation([1,2,0,4,3]).order()
+    6
+    >>> a**3 == a*a*a, a**-1 == ~a, a[1], a[1:3].tolist(), len({a, a**4})
+    (True, True, 3, [3, 2], 1)
+
+    apply_bits(words): bit i of the result is bit p[i] of a word
+    >>> hex(Flip(8).apply_bits(0x13))
+    '0xc8'
+    >>> Flip(8).apply_bits(np.array([0x13, 0x80], dtype=np.uint64)).tolist()
+    [200, 1]
+
+ Plain, Flip, Deal produce permutations, Shuffler applies them in turn
+    >>> Plain(4), Flip(4), Deal(6, 2)
+    (0,1,2,3, 3,2,1,0, 0,2,4,1,3,5)
+    >>> l = list('abcd')
+    >>> s = Shuffler(Flip(4), [1,0,3,2])
+    >>> s.shuffle(l); s.shuffle(l); l
+    ['c', 'd', 'a', 'b']
+
+ BitNetwork(perm, width=None): a bit permutation compiled for words
+  of width 8, 16, 32 or 64 bits, as a Benes network of delta swaps
+  or by shifts (see Permutation.apply_bits), whichever is shorter.
+    >>> net = BitNetwork(Deal(32, 2))
+    >>> len(net.stages) <= 9, net.plan
+    (True, 'benes')
+    >>> w = np.array([0x12345678, 0xffff0000], dtype=np.uint32)
+    >>> bool((net(w) == Deal(32, 2).apply_bits(w)).all())
+    True
+    >>> hex(net(0x12345678))
+    '0x141646ec'
+
+  python ubits.py -b compares it with the list-based Permutation
 
 
 """
 from binascii import hexlify
-from numba import jit
+from math import comb, gcd
+from multiprocessing import Pool, cpu_count
+import numpy as np
+from numba import jit, vectorize
 
 
 @jit("u4(u4)")
@@ -153,14 +286,56 @@ def hw64(x):
     return (x * h1) >> 56
 
 
+@vectorize(["u1(u1)", "u1(u2)", "u1(u4)", "u1(u8)"])
+def hw_array(x):
+    "element-wise hamming weight, a single compiled pass"
+    x = np.uint64(x)
+    x -= (x >> np.uint64(1)) & np.uint64(0x5555555555555555)
+    x = (x & np.uint64(0x3333333333333333)) + (
+        (x >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    x = (x + (x >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return (x * np.uint64(0x0101010101010101)) >> np.uint64(56)
+
+
+def walsh_hadamard(a, axis=-1):
+    "sum of (-1)^(u.x) a[x] for each u, along axis"
+    a = np.moveaxis(np.asarray(a), axis, -1).astype(np.int64, order="C")
+    n = a.shape[-1]
+    h = 1
+    while h < n:
+        v = a.reshape(a.shape[:-1] + (n // (2 * h), 2, h))
+        x = v[..., 0, :].copy()
+        v[..., 0, :] += v[..., 1, :]
+        v[..., 1, :] = x - v[..., 1, :]
+        h *= 2
+    return np.moveaxis(a, -1, axis)
+
+
+def hw_bigint(x):
+    "hamming weight of |x|, counted over its uint64 words"
+    x = abs(x)
+    if x >> 64 == 0:
+        return int(hw64(x))
+    words = np.frombuffer(
+        x.to_bytes(((x.bit_length() + 63) // 64) * 8, "little"), dtype=np.uint64)
+    return int(hw_array(words).sum(dtype=np.uint64))
+
+
 def hw(x):
-    if not x:
+    "hamming weight"
+    if x is None:
         return 0
     if hasattr(x, "value"):
         x = x.value
+    if isinstance(x, np.ndarray) and x.dtype.kind in "iu":
+        if x.dtype.kind == "i": # two's complement weights
+            x = x.view("u{}".format(x.dtype.itemsize))
+        return int(hw_array(x).sum(dtype=np.uint64))
     if hasattr(x, "__iter__"):
-        return sum([hw32(i) for i in x])
-    return hw32(x)
+        return sum(hw_bigint(i) for i in x)
+    if not x:
+        return 0
+    return hw_bigint(x)
 
 
 def lsw(x, n=0):
@@ -182,6 +357,26 @@ def lb(x):
     return x & (-x)
 
 
+def clmul(a, b):
+    "carry-less product, 4-bit windowed for long operands"
+    if a.bit_length() < b.bit_length():
+        a, b = b, a
+    res = 0
+    if b.bit_length() <= 32:
+        while b:
+            if b & 1:
+                res ^= a
+            a <<= 1
+            b >>= 1
+        return res
+    table = [0, a]
+    for i in range(2, 16):
+        table.append((table[i >> 1] << 1) ^ table[i & 1])
+    for shift in range((b.bit_length() - 1) & -4, -1, -4):
+        res = (res << 4) ^ table[(b >> shift) & 15]
+    return res
+
+
 class bits(object):
     """internally, represented by a Python integer
     """
@@ -212,8 +407,10 @@ class bits(object):
     def as_bytes(self):
         return self.val.to_bytes((self.bitlength + 7) // 8, byteorder="big")
 
-    def stream(self, chunk_length):
+    def stream(self, chunk_length, lazy=False):
         "split the value into a sequence of chunks"
+        if lazy:
+            return chunks(self, chunk_length)
         l, res, val = 0, [], self.val
         mask = (1 << chunk_length) - 1
         while l < self.bitlength:
@@ -254,6 +451,231 @@ class bits(object):
         return bits(int.from_bytes(val, byteorder="big"), self.bitlength)
 
 
+def _byte_blocks(source, block_size):
+    "blocks of bytes of a file or an iterable"
+    if hasattr(source, "read"):
+        while True:
+            block = source.read(block_size)
+            if not block:
+                return
+            yield block
+    else:
+        for block in source:
+            for i in range(0, len(block), block_size):
+                yield block[i : i + block_size]
+
+
+def chunks(source, chunk_length, block_size=1 << 16):
+    """stream chunks MSB first, keeping in memory a block of the source.
+    A source of a known length (int, str, bytes, bits) is padded 
+    with leading zeros as in bits.stream, otherwise the last chunk 
+    is truncated"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        blocks, bitlength = _byte_blocks([memoryview(source)], block_size), len(source) * 8
+    elif isinstance(source, (bits, int, str, list)):
+        source = bits(source)
+        blocks = _byte_blocks([source.as_bytes()], block_size)
+        bitlength = source.bitlength
+    else:
+        blocks, bitlength = _byte_blocks(source, block_size), None
+    # leading zeros are ignored, so nacc may start negative
+    nacc = 0
+    if bitlength is not None:
+        nacc = -bitlength % chunk_length - (-bitlength & 7)
+    acc, mask = 0, (1 << chunk_length) - 1
+    step = max(8, (chunk_length + 7) // 8)
+    for block in blocks:
+        for i in range(0, len(block), step):
+            piece = block[i : i + step]
+            acc = (acc << (8 * len(piece))) | int.from_bytes(piece, "big")
+            nacc += 8 * len(piece)
+            while nacc >= chunk_length:
+                nacc -= chunk_length
+                yield bits((acc >> nacc) & mask, chunk_length)
+            acc &= (1 << max(nacc, 0)) - 1
+    if nacc > 0:
+        yield bits(acc, nacc)
+
+
+class BitArray(object):
+    """bits stored MSB first in a numpy uint8 buffer, 
+    a slice is a view into the same buffer"""
+
+    def __init__(self, val=0, bitlength=0):
+        if isinstance(val, BitArray):
+            buf, offset, bitlength = val.buf, val.offset, val.bitlength
+        elif isinstance(val, (np.ndarray, bytes, bytearray, memoryview)):
+            buf = np.frombuffer(val, dtype=np.uint8)
+            bitlength = bitlength or len(buf) * 8
+            offset = len(buf) * 8 - bitlength
+            if offset < 0:
+                raise ValueError("bitlength exceeds the buffer")
+        else:
+            val = bits(val, bitlength)
+            buf = np.frombuffer(bytearray(val.as_bytes()), dtype=np.uint8)
+            bitlength = val.bitlength
+            offset = len(buf) * 8 - bitlength
+        self.buf, self.offset, self.bitlength = buf, offset, bitlength
+
+    @classmethod
+    def _view(cls, buf, offset, bitlength):
+        res = cls.__new__(cls)
+        res.buf, res.offset, res.bitlength = buf, offset, bitlength
+        return res
+
+    def __len__(self):
+        return self.bitlength
+
+    def _cover(self):
+        "the bytes of buf covering the bits"
+        return self.buf[self.offset >> 3 : (self.offset + self.bitlength + 7) >> 3]
+
+    def _aligned(self):
+        return not (self.offset | self.bitlength) & 7
+
+    def unpack(self):
+        "uint8 array of 0/1, MSB first"
+        o = self.offset & 7
+        return np.unpackbits(self._cover())[o : o + self.bitlength]
+
+    def _packed(self):
+        "packed bits, left aligned; a view if possible"
+        if self._aligned():
+            return self._cover()
+        return np.packbits(self.unpack())
+
+    def _store(self, u):
+        "store an array of 0/1"
+        cover = self._cover()
+        if self._aligned():
+            cover[:] = np.packbits(u)
+        else:
+            o = self.offset & 7
+            t = np.unpackbits(cover)
+            t[o : o + self.bitlength] = u
+            cover[:] = np.packbits(t)
+
+    def copy(self):
+        buf = np.array(self._packed())
+        return BitArray._view(buf, 0, self.bitlength)
+
+    def to_bits(self):
+        "the packed buffer is read by int.from_bytes directly"
+        pad = -self.bitlength & 7
+        return bits(int.from_bytes(self._packed(), "big") >> pad, self.bitlength)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.bitlength)
+            if step != 1:
+                raise IndexError("only contiguous slices are views")
+            return BitArray._view(self.buf, self.offset + start, max(stop - start, 0))
+        if index < 0:
+            index += self.bitlength
+        if not 0 <= index < self.bitlength:
+            raise IndexError("bit index out of range")
+        i = self.offset + index
+        return int(self.buf[i >> 3] >> (7 - (i & 7))) & 1
+
+    def __setitem__(self, index, value):
+        if not isinstance(index, slice):
+            index = slice(index, (index + 1) or None)
+        dst = self[index]
+        if isinstance(value, int) and not isinstance(value, bool) and len(dst) != 1:
+            value = BitArray(bits(value, len(dst)))
+        if isinstance(value, (BitArray, bits)):
+            value = BitArray(value).unpack()
+        dst._store(np.broadcast_to(np.asarray(value, dtype=np.uint8), len(dst)))
+
+    def _inplace(self, other, op):
+        "other is aligned to the LS bits of self, as in bits"
+        other = other if isinstance(other, BitArray) else BitArray(other)
+        assert self.bitlength >= other.bitlength
+        dst = self[self.bitlength - other.bitlength :]
+        if dst._aligned() and other._aligned():
+            cover = dst._cover()
+            op(cover, other._cover(), out=cover)
+        else:
+            dst._store(op(dst.unpack(), other.unpack()))
+        if op is np.bitwise_and:
+            self[: self.bitlength - other.bitlength] = 0
+        return self
+
+    def __ixor__(self, other):
+        return self._inplace(other, np.bitwise_xor)
+
+    def __iand__(self, other):
+        return self._inplace(other, np.bitwise_and)
+
+    def __ior__(self, other):
+        return self._inplace(other, np.bitwise_or)
+
+    def __xor__(self, other):
+        return self.copy()._inplace(other, np.bitwise_xor)
+
+    def __and__(self, other):
+        return self.copy()._inplace(other, np.bitwise_and)
+
+    def __or__(self, other):
+        return self.copy()._inplace(other, np.bitwise_or)
+
+    def __ilshift__(self, n):
+        "shift towards the MSB, keeping the bitlength"
+        n = min(n, self.bitlength)
+        if n & 7 == 0 and self._aligned():
+            cover, k = self._cover(), n >> 3
+            cover[: len(cover) - k] = cover[k:].copy()
+            cover[len(cover) - k :] = 0
+        else:
+            u = self.unpack()
+            u[: self.bitlength - n] = u[n:].copy()
+            u[self.bitlength - n :] = 0
+            self._store(u)
+        return self
+
+    def __irshift__(self, n):
+        "shift towards the LSB, keeping the bitlength"
+        n = min(n, self.bitlength)
+        if n & 7 == 0 and self._aligned():
+            cover, k = self._cover(), n >> 3
+            cover[k:] = cover[: len(cover) - k].copy()
+            cover[:k] = 0
+        else:
+            u = self.unpack()
+            u[n:] = u[: self.bitlength - n].copy()
+            u[:n] = 0
+            self._store(u)
+        return self
+
+    def __eq__(self, other):
+        return (isinstance(other, BitArray) and self.bitlength == other.bitlength
+                and np.array_equal(self.unpack(), other.unpack()))
+
+    def __ne__(self, other):
+        return not (self == other)
+
+    def stream(self, chunk_length):
+        """split into chunks of up to 64 bits, as bits.stream does;
+        returns a uint64 array"""
+        assert 0 < chunk_length <= 64
+        n = -(-self.bitlength // chunk_length)
+        if (chunk_length in (8, 16, 32, 64) and self._aligned()
+                and self.bitlength % chunk_length == 0):
+            return self._cover().view(">u{}".format(chunk_length // 8)).astype(np.uint64)
+        t = np.zeros(n * chunk_length, dtype=np.uint8)
+        t[len(t) - self.bitlength :] = self.unpack()
+        b = np.packbits(t.reshape(n, chunk_length), axis=1)
+        w = np.zeros((n, 8), dtype=np.uint8)
+        w[:, 8 - b.shape[1] :] = b
+        return w.view(">u8").ravel() >> np.uint64(8 * b.shape[1] - chunk_length)
+
+    def __repr__(self):
+        return f"BitArray(0x{self.to_bits().val:x}, {self.bitlength})"
+
+    def __str__(self):
+        return str(self.to_bits())
+
+
 # iterators
 def bytes_be(x):
     "iterate in BE order"
@@ -307,116 +729,514 @@ def bytes2words(list_of_bytes):
         yield w
 
 
-def masks(m, n):
-    "masks with m out of n bits set"
+def _words(x):
+    "uint32 array of words; a buffer is read as LE words"
+    if isinstance(x, (bytes, bytearray, memoryview)):
+        return np.frombuffer(x, dtype="<u4")
+    return np.asarray(x, dtype=np.uint32)
+
+
+def bytes_be_array(words):
+    "bytes of all words, BE order within a word"
+    return _words(words).astype(">u4").view(np.uint8)
+
+
+def bytes_le_array(words):
+    "bytes of all words, LE order within a word"
+    return _words(words).astype("<u4").view(np.uint8)
+
+
+def nibbles_be_array(words):
+    "nibbles of all words, BE order within a word"
+    b = bytes_be_array(words)
+    res = np.empty(2 * len(b), dtype=np.uint8)
+    res[0::2], res[1::2] = b >> 4, b & 0xF
+    return res
+
+
+def nibbles_le_array(words):
+    "nibbles of all words, LE order within a word"
+    b = bytes_le_array(words)
+    res = np.empty(2 * len(b), dtype=np.uint8)
+    res[0::2], res[1::2] = b & 0xF, b >> 4
+    return res
+
+
+def bytes2words_array(list_of_bytes):
+    "both in LE order, the last word is zero padded"
+    if isinstance(list_of_bytes, (bytes, bytearray, memoryview)):
+        b = np.frombuffer(list_of_bytes, dtype=np.uint8)
+    else:
+        b = np.asarray(list_of_bytes, dtype=np.uint8)
+    if len(b) & 3:
+        b = np.concatenate((b, np.zeros(-len(b) & 3, dtype=np.uint8)))
+    return b.view("<u4").astype(np.uint32)
+
+
+def n2words_le_array(n, lwords=None):
+    "LE array of words"
+    if not lwords:
+        lwords = (n.bit_length() + 31) // 32
+    n &= (1 << (32 * lwords)) - 1
+    return np.frombuffer(n.to_bytes(4 * lwords, "little"), dtype="<u4")
+
+
+def n_masks(m, n):
+    "the number of masks with m out of n bits set"
+    return comb(n, m)
+
+
+def n_products(subdim, dim):
+    "the number of subdim subspaces of the dim-dimensional cube"
+    return comb(dim, subdim) << subdim
+
+
+def mask_rank(mask):
+    "the index of mask in masks(), in the combinatorial number system"
+    r, k = 0, 0
+    while mask:
+        k += 1
+        r += comb(lb(mask).bit_length() - 1, k)
+        mask &= mask - 1
+    return r
+
+
+def mask_unrank(r, m, n):
+    "masks(m, n) at the index r"
+    mask, pos = 0, n
+    for k in range(m, 0, -1):
+        pos -= 1
+        while comb(pos, k) > r:
+            pos -= 1
+        r -= comb(pos, k)
+        mask |= 1 << pos
+    return mask
+
+
+def deposit(x, mask):
+    "scatter the LS bits of x to the bits set in mask (pdep)"
+    res = 0
+    while mask and x:
+        bit = lb(mask)
+        if x & 1:
+            res |= bit
+        x >>= 1
+        mask ^= bit
+    return res
+
+
+def extract(x, mask):
+    "gather the bits of x at the bits set in mask (pext)"
+    res, i = 0, 0
+    while mask:
+        bit = lb(mask)
+        if x & bit:
+            res |= 1 << i
+        i += 1
+        mask ^= bit
+    return res
+
+
+def product_rank(mask, v):
+    "the index of (mask, v) in products()"
+    m = hw(mask)
+    return (mask_rank(mask) << m) | extract(v, mask)
+
+
+def product_unrank(r, subdim, dim):
+    "products(subdim, dim) at the index r"
+    mask = mask_unrank(r >> subdim, subdim, dim)
+    return mask, deposit(r & ((1 << subdim) - 1), mask)
+
+
+def _next_mask(mask):
+    "Gosper's hack"
+    smallest = lb(mask)
+    ripple = mask + smallest
+    ones = mask ^ ripple
+    ones = (ones >> 2) // smallest
+    return ripple | ones
+
+
+@jit(nopython=True)
+def _fill_masks(mask, out):
+    one = np.uint64(1)
+    for i in range(len(out)):
+        out[i] = mask
+        if i + 1 == len(out):
+            break
+        smallest = mask & (~mask + one)
+        ripple = mask + smallest
+        ones = ((mask ^ ripple) >> np.uint64(2)) // smallest
+        mask = ripple | ones
+
+
+@jit(nopython=True)
+def _fill_products(mask, v, out_masks, out_v):
+    one = np.uint64(1)
+    for i in range(len(out_masks)):
+        out_masks[i], out_v[i] = mask, v
+        v = (v - mask) & mask
+        if v == 0 and i + 1 < len(out_masks):
+            smallest = mask & (~mask + one)
+            ripple = mask + smallest
+            ones = ((mask ^ ripple) >> np.uint64(2)) // smallest
+            mask = ripple | ones
+
+
+def _range(total, start, stop):
+    if stop is None or stop > total:
+        stop = total
+    return start, max(stop, start)
+
+
+def masks(m, n, start=0, stop=None, batch=None):
+    """masks with m out of n bits set, with indices in range(start, stop);
+    if batch, yields uint64 arrays of up to batch masks (n <= 64)"""
     if m > n:
         raise ValueError("Inconsistent parameters for mask_generator")
-    mask = (1 << m) - 1
-    n = 1 << n
-    while mask < n:
+    start, stop = _range(n_masks(m, n), start, stop)
+    if batch:
+        return _mask_batches(m, n, start, stop, batch)
+    return _masks(m, n, start, stop)
+
+
+def _masks(m, n, start, stop):
+    mask = mask_unrank(start, m, n)
+    for i in range(start, stop):
         yield mask
-        smallest = lb(mask)
-        ripple = mask + smallest
-        ones = mask ^ ripple
-        ones = (ones >> 2) // smallest
-        mask = ripple | ones
+        if i + 1 < stop:
+            mask = _next_mask(mask)
 
 
-def products(subdim, dim):
+def _mask_batches(m, n, start, stop, batch):
+    if n > 64:
+        raise ValueError("batches are limited to 64 bits")
+    for i in range(start, stop, batch):
+        out = np.empty(min(batch, stop - i), dtype=np.uint64)
+        _fill_masks(np.uint64(mask_unrank(i, m, n)), out)
+        yield out
+
+
+def products(subdim, dim, start=0, stop=None, batch=None):
     """iterates through all subdim subspaces 
     of the dim-dimensional cube.  Returns (mask, v), so
-    that a subspace is defined as {x| x & mask == v}."""
-    for mask in masks(subdim, dim):
-        v, vbit = 0, lb(mask)
-        while True:
-            yield (mask, v)
-            if v & vbit:
-                # the current bit in v is already lit
-                # bits to vary in v, MS than vbit
-                m = (v ^ mask) & (-vbit << 1)
-                vbit = lb(m)
-                if vbit:
-                    v ^= vbit
-                    v &= -vbit
-                    vbit = lb(mask)
-                else:
-                    break
-            else:
-                v ^= vbit
+    that a subspace is defined as {x| x & mask == v}.
+    Indices are in range(start, stop); if batch, yields pairs 
+    of uint64 arrays (masks, v) of up to batch items (dim <= 64)"""
+    if subdim > dim:
+        raise ValueError("Inconsistent parameters for mask_generator")
+    start, stop = _range(n_products(subdim, dim), start, stop)
+    if batch:
+        return _product_batches(subdim, dim, start, stop, batch)
+    return _products(subdim, dim, start, stop)
+
+
+def _products(subdim, dim, start, stop):
+    mask, v = product_unrank(start, subdim, dim)
+    for i in range(start, stop):
+        yield (mask, v)
+        # the next submask of mask, in increasing order
+        v = (v - mask) & mask
+        if not v and i + 1 < stop:
+            mask = _next_mask(mask)
+
+
+def _product_batches(subdim, dim, start, stop, batch):
+    if dim > 64:
+        raise ValueError("batches are limited to 64 bits")
+    for i in range(start, stop, batch):
+        size = min(batch, stop - i)
+        out_masks = np.empty(size, dtype=np.uint64)
+        out_v = np.empty(size, dtype=np.uint64)
+        mask, v = product_unrank(i, subdim, dim)
+        _fill_products(np.uint64(mask), np.uint64(v), out_masks, out_v)
+        yield out_masks, out_v
+
+
+def shards(total, nshards, start=0):
+    "split range(start, total) into nshards contiguous (start, stop) ranges"
+    size, extra = divmod(total - start, nshards)
+    res = []
+    for i in range(nshards):
+        stop = start + size + (i < extra)
+        res.append((start, stop))
+        start = stop
+    return res
+
+
+def _run_shard(args):
+    worker, generator, m, n, start, stop = args
+    return worker(generator(m, n, start, stop))
+
+
+def map_shards(worker, generator, m, n, processes=None, nshards=None, start=0):
+    """worker(generator(m, n, start, stop)) for shards of masks or products 
+    in a process pool; the results are listed in the order of the shards.
+    A stopped search may be resumed from any index by start"""
+    total = n_products(m, n) if generator is products else n_masks(m, n)
+    processes = processes or cpu_count()
+    nshards = nshards or 4 * processes
+    tasks = [(worker, generator, m, n, a, b) for a, b in shards(total, nshards, start)]
+    with Pool(processes) as pool:
+        return pool.map(_run_shard, tasks)
 
 
 class Permutation(object):
-    "Invertible permutation"
+    "Invertible permutation, stored as a numpy index array"
 
     def __init__(self, p):
-        self.p = list(p)
-        assert len(set(self.p)) == len(self.p), "true permutation"
+        if not isinstance(p, np.ndarray):
+            p = list(p)
+        self.p = np.array(p, dtype=np.intp)
+        assert len(np.unique(self.p)) == len(self.p), "true permutation"
+        self._deltas = None
+
+    def __len__(self):
+        return len(self.p)
 
     def __getitem__(self, value):
         try:
-            return self.p[value]
+            res = self.p[value]
         except IndexError:
             return None
+        return int(res) if isinstance(value, (int, np.integer)) else res
 
     def __repr__(self):
         l = (len(self.p).bit_length() + 3) // 4
         f = "{{:{:d}d}}".format(l)
-        return ",".join(f.format(i) for i in self.p)
+        return ",".join(f.format(i) for i in self.p.tolist())
 
     def __iter__(self):
-        return iter(self.p)
+        return iter(self.p.tolist())
+
+    def __eq__(self, other):
+        return isinstance(other, Permutation) and np.array_equal(self.p, other.p)
+
+    def __ne__(self, other):
+        return not (self == other)
+
+    def __hash__(self):
+        return hash(tuple(self.p.tolist()))
 
     def __invert__(self):
-        res = [None] * len(self.p)
-        for i, v in enumerate(self.p):
-            res[v] = i
+        res = np.empty_like(self.p)
+        res[self.p] = np.arange(len(self.p))
         return Permutation(res)
 
     def __call__(self, l):
-        return (l[i] for i in self.p)
+        if isinstance(l, np.ndarray):
+            return l[..., self.p]
+        return (l[i] for i in self.p.tolist())
 
     def __mul__(self, other):
-        return Permutation(self(other.p))
+        return Permutation(other.p[self.p])
 
     def __add__(self, other):
-        l = len(self.p)
-        res = Permutation(self.p)
-        for i in other:
-            res.p.append(l + i)
+        return Permutation(np.concatenate((self.p, np.asarray(other.p) + len(self.p))))
+
+    def cycles(self):
+        "cycle decomposition, fixed points excluded"
+        res, seen = [], [False] * len(self.p)
+        p = self.p.tolist()
+        for i in range(len(p)):
+            if seen[i] or p[i] == i:
+                continue
+            c, j = [], i
+            while not seen[j]:
+                seen[j] = True
+                c.append(j)
+                j = p[j]
+            res.append(tuple(c))
         return res
 
+    def order(self):
+        res = 1
+        for c in self.cycles():
+            res = res * len(c) // gcd(res, len(c))
+        return res
+
+    def __pow__(self, power):
+        "by cycles, in O(n)"
+        res = np.arange(len(self.p))
+        for c in self.cycles():
+            c = np.array(c)
+            res[c] = c[(np.arange(len(c)) + power) % len(c)]
+        return Permutation(res)
+
     def shuffle(self, l):
-        for i, x in enumerate(self(l)):
-            l[i] = x
+        if isinstance(l, np.ndarray):
+            l[...] = self(l)
+        else:
+            l[:] = list(self(l))
+
+    def deltas(self):
+        "[(shift, mask)]: bits moved by the same shift, toward the LSB if positive"
+        if self._deltas is None:
+            groups = dict()
+            for i, j in enumerate(self.p.tolist()):
+                groups[j - i] = groups.get(j - i, 0) | (1 << i)
+            self._deltas = sorted(groups.items())
+        return self._deltas
+
+    def apply_bits(self, words):
+        """permute bits of an integer or of a uint64 array:
+        bit i of the result is bit p[i] of the argument"""
+        if isinstance(words, np.ndarray):
+            words = words.astype(np.uint64, copy=False)
+            res = np.zeros_like(words)
+            for d, mask in self.deltas():
+                w = words >> np.uint64(d) if d >= 0 else words << np.uint64(-d)
+                res |= w & np.uint64(mask)
+            return res
+        res = 0
+        for d, mask in self.deltas():
+            res |= (words >> d if d >= 0 else words << -d) & mask
+        return res
 
 
 def Plain(n):
     "Permutation(0, 1, ..., n-1)"
-    return Permutation(range(n))
+    return Permutation(np.arange(n))
 
 
 def Flip(n):
     "Permutation(n-1, n-2, ..., 0)"
-    return Permutation(range(n - 1, -1, -1))
+    return Permutation(np.arange(n - 1, -1, -1))
 
 
 def Deal(n, step):
     "Permutation(0, 2, ..., 1, 3, ...)"
-    p = []
-    for i in range(step):
-        p += range(i, n, step)
-    return Permutation(p)
+    return Permutation(np.concatenate([np.arange(i, n, step) for i in range(step)]))
 
 
 class Shuffler(object):
+    "applies the permutations in turn"
+
     def __init__(self, *l):
-        self.l = list(l)
+        self.l = [p if isinstance(p, Permutation) else Permutation(p) for p in l]
 
     def shuffle(self, l):
         p = self.l.pop(0)
         p.shuffle(l)
 
 
+def _benes(src, base, level, in_masks, out_masks):
+    """route the Benes network: dest d of the block at base
+    receives from src[d]; the swaps of the level are added to masks"""
+    n = len(src)
+    h = n // 2
+    if n == 2:
+        if src[0]:
+            in_masks[level] |= 1 << base
+        return
+    inv = [0] * n
+    for d, x in enumerate(src):
+        inv[x] = d
+    in_swap, out_swap = [None] * h, [None] * h
+    for t in range(h):
+        if out_swap[t] is not None:
+            continue
+        out_swap[t], d = False, t
+        while True:
+            sub = (d ^ h if out_swap[d % h] else d) >= h
+            x = src[d]
+            in_swap[x % h] = (x >= h) != sub
+            # the partner of x goes through the other subnetwork
+            d = inv[x ^ h]
+            if out_swap[d % h] is not None:
+                break
+            out_swap[d % h] = (d >= h) == sub
+            d ^= h
+    sub_src = ([0] * h, [0] * h)
+    for d, x in enumerate(src):
+        q = d ^ h if out_swap[d % h] else d
+        x = x ^ h if in_swap[x % h] else x
+        sub_src[q >= h][q % h] = x % h
+    for j in range(h):
+        if in_swap[j]:
+            in_masks[level] |= 1 << (base + j)
+        if out_swap[j]:
+            out_masks[level] |= 1 << (base + j)
+    _benes(sub_src[0], base, level + 1, in_masks, out_masks)
+    _benes(sub_src[1], base + h, level + 1, in_masks, out_masks)
+
+
+class BitNetwork(object):
+    """a compiled permutation of bits of words: 
+    bit i of the result is bit perm[i] of a word"""
+
+    def __init__(self, perm, width=None):
+        perm = perm if isinstance(perm, Permutation) else Permutation(perm)
+        width = width or max(8, 1 << (len(perm) - 1).bit_length())
+        if width not in (8, 16, 32, 64) or len(perm) > width:
+            raise ValueError("Unsupported word width")
+        self.width = width
+        self.perm = Permutation(np.concatenate((perm.p, np.arange(len(perm), width))))
+        k = width.bit_length() - 1
+        in_masks, out_masks = [0] * k, [0] * k
+        _benes(self.perm.p.tolist(), 0, 0, in_masks, out_masks)
+        stages = [(width >> (i + 1), m) for i, m in enumerate(in_masks)]
+        stages += [(width >> (i + 1), m) for i, m in reversed(list(enumerate(out_masks[:-1])))]
+        self.stages = [(shift, mask) for shift, mask in stages if mask]
+        self.deltas = [(d, m) for d, m in self.perm.deltas() if m]
+        # a delta swap takes 6 operations, a shift group takes 3
+        self.plan = "benes" if 2 * len(self.stages) < len(self.deltas) else "deltas"
+
+    def __call__(self, words):
+        if not isinstance(words, np.ndarray):
+            if self.plan == "deltas":
+                return self.perm.apply_bits(words)
+            for shift, mask in self.stages:
+                t = ((words >> shift) ^ words) & mask
+                words ^= t ^ (t << shift)
+            return words
+        dtype = np.dtype("u{}".format(max(self.width, 8 * words.dtype.itemsize) // 8))
+        if self.plan == "deltas":
+            return self.perm.apply_bits(words).astype(dtype)
+        x = words.astype(dtype)
+        t = np.empty_like(x)
+        for shift, mask in self.stages:
+            shift, mask = dtype.type(shift), dtype.type(mask)
+            np.right_shift(x, shift, out=t)
+            t ^= x
+            t &= mask
+            x ^= t
+            np.left_shift(t, shift, out=t)
+            x ^= t
+        return x
+
+
+def benchmark(width=64, nwords=1 << 16, seed=1):
+    "words per second of the bit permutation paths"
+    from random import Random
+    from time import perf_counter
+
+    r = Random(seed)
+    p = list(range(width))
+    r.shuffle(p)
+    perm = Permutation(p)
+    words = np.array([r.getrandbits(width) for _ in range(nwords)], dtype=np.uint64)
+
+    def naive(ws):
+        return [sum(b << i for i, b in enumerate(perm([(w >> j) & 1 for j in range(width)])))
+                for w in ws.tolist()]
+
+    t = perf_counter()
+    net = BitNetwork(perm)
+    compile_time = perf_counter() - t
+    paths = [("list", naive, words[:1024]), ("apply_bits", perm.apply_bits, words),
+             ("network ({})".format(net.plan), net, words)]
+    ref = naive(words[:1024])
+    for name, f, ws in paths:
+        t = perf_counter()
+        res = f(ws)
+        t = perf_counter() - t
+        assert list(res[:1024]) == ref, name
+        print("{:20} {:14.0f} words/s".format(name, len(ws) / t))
+    print("{:20} {:14.6f} s".format("compile", compile_time))
+
+
 # TBD
 """           
 class PartialFunction(object):
@@ -435,65 +1255,6 @@ class PartialFunction(object):
         for i in other:
             p[i] = self[other[i]]
         return PartialFunction(p)
-
-    def Logic(object):
-    '''logical representation of a (partial) function f
-       from n bits to m bits'''
-    def __init__(self, func, n, m):
-        self.f = []
-        self.input_width = n
-        self.output_width = m
-        for i in range(m):
-            output_bit = 1 << i
-            positive_points, neutral_points = [], []
-            for i in range(1 << n):
-                p = func[i]
-                if p is None: neutral_points.append(i)
-                elif output_bit & p: 
-                    positive_points.append(i)
-            n2cover = len(positive_points)
-            if n2cover == 0:
-                self.f.append([])
-            else:
-                points = positive_points + neutral_points
-                self.f.append(self.build(points, n2cover))
-    def build(self, points, n2cover):
-        sop = []
-        for j in range(1, self.input_width): 
-            if n2cover == 0: break
-            capacity = 1 << (self.input_width - j)
-            for g in products(j, self.input_width):
-                g_contains = lambda p: (g[0] & p) == g[1]
-                if not any(g_contains(p) for p in points[:n2cover]):
-                    continue
-                if sum (g_contains(p) for p in points) != capacity:
-                    continue #this product is not full
-                sop.append(g)
-                i = 0
-                n2cover -= 1
-                while True:
-                    while not g_contains(points[i]) and i < n2cover: 
-                        i += 1
-                    while g_contains(points[n2cover]) and i < n2cover:
-                        n2cover -= 1
-                    if i == n2cover:
-                        if not g_contains(points[i]): n2cover += 1
-                        break
-                    points[n2cover], points[i] = points[i], points[n2cover]
-                    i += 1
-                    n2cover -= 1
-                if n2cover == 0: break
-        return sop
-    def __call__(self, arg):
-        res = 0
-        for i in range(self.output_width):
-            output_bit = 1 << i
-            sop = self.f[i]
-            for p in sop:
-                if i & p[0] == p[1]:
-                    res |= output_bit
-                    break
-        return res
 """
 
 if __name__ == "__main__":
@@ -504,5 +1265,7 @@ if __name__ == "__main__":
             import doctest
 
             doctest.testmod()
+        elif sys.argv[1] == "-b":
+            benchmark()
         elif sys.argv[1] == "-h":
-            print("Use -v  to run self-test")
+            print("Use -v  to run self-test, -b to benchmark bit permutations")
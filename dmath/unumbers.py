@@ -6,6 +6,18 @@
    >>> p[-5:]
    [971, 977, 983, 991, 997]
 
+  iter_primes(limit, start=0): numpy arrays of primes below limit,
+   by a segmented odd-only bit-packed sieve in bounded memory
+   >>> [a.tolist() for a in iter_primes(60, 20, segment=1)]
+   [[23, 29, 31], [37, 41, 43, 47], [53, 59]]
+   >>> sum(len(a) for a in iter_primes(10**7))
+   664579
+
+  prime_table(limit): an array of the primes below at least limit,
+   memory-mapped from primes.dat, which is extended if needed
+   >>> prime_table(100)[:5].tolist()
+   [2, 3, 5, 7, 11]
+
   primes_product: product of consequent primes
    >>> primes_product(2, 8)
    1616615
@@ -18,6 +30,44 @@
    >>> x = 0x3473ab29; print(fermat_test(x), fermat_test(x, 3))
    True False
 
+  miller_rabin(n, bases): strong probable prime test
+   >>> miller_rabin(2047, [2]), miller_rabin(2047, [3])
+   (True, False)
+
+  is_prime(n): deterministic Miller-Rabin below 3.3e24, 
+   Baillie-PSW above
+   >>> is_prime(2**61 - 1), is_prime(561), is_prime(2**127 - 1)
+   (True, False, True)
+   >>> is_prime((2**89 - 1) * (2**107 - 1))
+   False
+
+  factor(n, effort=None): the prime factorization {p: e}, by trial 
+   division and Pollard-Brent rho, bounded by effort steps if given
+   >>> factor(2**64 - 1)
+   {3: 1, 5: 1, 17: 1, 257: 1, 641: 1, 65537: 1, 6700417: 1}
+   >>> factor(2**2 * 10007 * 1000003**2)
+   {2: 2, 10007: 1, 1000003: 2}
+   >>> factor(2**137 - 1, effort = 1 << 12)
+   Traceback (most recent call last):
+   ...
+   ValueError: No factor of 174224571863520493293247799005065324265471 in 4096 steps
+
+  trial_division(candidates, limit): candidates without prime 
+   factors below limit, by a gcd with their product
+   >>> trial_division([1009 * 1013, 1019 * 2, 1021 * 1031], 1012)
+   [1052651]
+
+  random_prime(bits, count=None, rng=None): a random prime of bits bits,
+   or an iterator over count primes, each found as it is consumed.
+   Each prime is the first one in a sieved interval of odd numbers
+   starting at a random point
+   >>> random_prime(512).bit_length()
+   512
+   >>> ps = random_prime(100, 5); next(ps).bit_length()
+   100
+   >>> all(map(is_prime, ps)), len(list(random_prime(20, 3)))
+   (True, 3)
+
  gcd: for Python numbers
   >>> gcd(127*45, 127*101)
   127
@@ -34,9 +84,33 @@
  inv32: inverse mod 2**32; the argument shall be odd
   >>> hex(inv32(0x12345))[:10]
   '0xc678f78d'
+
+ gcd_many(x, y): element-wise gcd of arrays, compiled for int64
+  >>> gcd_many([12, 35, 17], [18, 21, 5]).tolist()
+  [6, 7, 1]
+
+ inverse_many(values, modulus): inverses of values modulo a shared
+ modulus, by Montgomery's trick (one inversion for all), 
+ or modulo an array of moduli, element-wise
+  >>> inverse_many([2, 3, 4], 7)
+  [4, 5, 2]
+  >>> inverse_many(np.array([2, 3]), np.array([5, 7])).tolist()
+  [3, 5]
+
+ MontgomeryContext(modulus): Montgomery multiplication modulo an odd
+ multi-word modulus, for integers or arrays of LE words (one row each)
+  >>> n = 2**127 - 1; M = MontgomeryContext(n)
+  >>> a, b = 3**70, 5**50
+  >>> M.from_mont(M.mul(M.to_mont(a), M.to_mont(b))) == a * b % n
+  True
+  >>> W = M.to_words([a, b])
+  >>> M.from_words(M.mulmod_words(W, W)) == [a * a % n, b * b % n]
+  True
+  >>> M.from_words(M.powmod_words(W, 65537)) == [pow(a, 65537, n), pow(b, 65537, n)]
+  True
   
  n2w: a Python integer -> C style WINT
-  >>> n2w(0x4000000030000000200000001)
+  >>> _ = n2w(0x4000000030000000200000001)
    {0x00000001, 0x00000002, 0x00000003, 0x00000004}
  
  n2a, a2n: a Python integer <-> list of words, LE
@@ -48,64 +122,161 @@
   >>> a2n(l) == x
   True
 
+ n2array: the same as a numpy '<u4' view of x.to_bytes(), 
+ a2n also reads arrays and buffers without copying
+  >>> n2array(0x12345678abcd1234, 3).tolist() == [0xabcd1234, 0x12345678, 0]
+  True
+  >>> a2n(n2array(x)) == x
+  True
+
+ n2f, f2n: integers <-> a file of LE words; write_ints writes many 
+ records at once, read_records maps a file of records and decodes 
+ them lazily; field(i) is a (records, words) array view of a field
+  >>> from tempfile import TemporaryFile
+  >>> f = TemporaryFile()
+  >>> write_ints(f, [(1, 2**40), (3, 4)], 1, 2)
+  >>> r = read_records(f, 1, 2)
+  >>> len(r), r[0], r[-1] == [3, 4]
+  (2, [1, 1099511627776], True)
+  >>> r.field(1).tolist()
+  [[0, 256], [4, 0]]
+
   """
-from os.path import exists, dirname, join
-from struct import pack, unpack
+from os import getpid, remove, replace
+from os.path import exists, dirname, join, getsize
+from struct import Struct, error as struct_error
 from random import getrandbits as grb
-from numba import jit
+from functools import reduce
+from itertools import islice
+from operator import mul
+from math import isqrt, log, gcd as math_gcd
+import numpy as np
+from numba import jit, vectorize
 
 def sieve(N=1000):
-    buf = list(range(N))
-    buf[1] = 0
-    for i in range(2, N):
-        d = buf[i]
-        if d:
-            for j in range(2*i, N, i):
-                buf[j] = 0
-    return list(filter(None, buf))
-
-def store_primes():
-    with open(join(dirname(__file__), 'primes.dat'), 'wb') as f:
-        for n in primes:
-            f.write(pack('i', n))
+    return primes_below(N).tolist()
+
+def primes_below(N):
+    "array of the primes below N, by an odd-only sieve"
+    if N <= 2:
+        return np.zeros(0, dtype=np.int64)
+    odd = np.ones(N // 2, dtype=bool) # odd[i] represents 2*i+1
+    odd[0] = False
+    for i in range(1, (isqrt(N - 1) - 1) // 2 + 1):
+        if odd[i]:
+            p = 2 * i + 1
+            odd[p * p // 2::p] = False
+    return np.concatenate(([2], 2 * np.flatnonzero(odd) + 1))
+
+@jit(nopython=True)
+def _mark(seg, lo, base):
+    "clear the odd multiples of base in seg: bit i represents lo + 2*i"
+    n = len(seg) * 8
+    for p in base:
+        start = p * p
+        if start < lo:
+            start = (lo + p - 1) // p * p
+            if start % 2 == 0:
+                start += p
+        for j in range((start - lo) // 2, n, p):
+            seg[j >> 3] &= ~np.uint8(1 << (j & 7))
+
+def iter_primes(limit, start=0, segment=1 << 20):
+    """arrays of the primes in [start, limit), segment by segment;
+    a segment holds 16*segment numbers in segment bytes"""
+    base = primes_below(isqrt(limit - 1) + 1 if limit > 1 else 0)[1:]
+    if start <= 2 < limit:
+        yield np.array([2], dtype=np.int64)
+    lo = max(start, 3) | 1
+    while lo < limit:
+        seg = np.full(segment, 0xff, dtype=np.uint8)
+        _mark(seg, lo, base)
+        n = min(8 * segment, (limit - lo + 1) // 2)
+        found = np.flatnonzero(np.unpackbits(seg, bitorder='little')[:n])
+        yield lo + 2 * found
+        lo += 16 * segment
+
+primes_file = join(dirname(__file__), 'primes.dat')
+HEADER = Struct('<4s4sQQ') # magic, dtype, count, limit
+
+def store_primes(limit=1000, fname=None):
+    "stream the primes below limit to a file, replaced atomically"
+    fname = fname or primes_file
+    tmp = "{}.{}".format(fname, getpid())
+    dtype = np.dtype('<u4' if limit <= 1 << 32 else '<u8')
+    count = 0
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(HEADER.pack(b'UPRM', dtype.str.encode(), 0, limit))
+            for a in iter_primes(limit):
+                f.write(a.astype(dtype).tobytes())
+                count += len(a)
+            f.seek(0)
+            f.write(HEADER.pack(b'UPRM', dtype.str.encode(), count, limit))
+        replace(tmp, fname)
+    finally:
+        if exists(tmp):
+            remove(tmp)
+
+def load_primes(fname=None):
+    "(memory-mapped array of primes, limit) from a file"
+    with open(fname or primes_file, 'rb') as f:
+        header = f.read(HEADER.size)
+    if len(header) < HEADER.size:
+        raise ValueError("Truncated primes file")
+    magic, dtype, count, limit = HEADER.unpack(header)
+    if magic != b'UPRM':
+        raise IOError("Not a primes file")
+    dtype = np.dtype(dtype.rstrip(b'\0').decode())
+    if not count:
+        if limit > 2:
+            raise ValueError("Incomplete primes file")
+        return np.zeros(0, dtype=dtype), limit
+    table = np.memmap(fname or primes_file, dtype=dtype, 
+                      mode='r', offset=HEADER.size, shape=(count,))
+    return table, limit
+
+table, table_limit = None, 0
+def prime_table(limit=1000):
+    "primes below at least limit, cached in primes.dat"
+    global table, table_limit
+    if table is not None and table_limit >= limit:
+        return table
+    try:
+        table, table_limit = load_primes()
+    except (IOError, ValueError):
+        pass
+    if table_limit < limit:
+        try:
+            store_primes(limit)
+            table, table_limit = load_primes()
+        except IOError:
+            print("Cannot store primes.dat")
+            table, table_limit = primes_below(limit), limit
+    return table
+
+def nth_prime_bound(n):
+    "an upper bound of the n-th prime, counting from 0"
+    n += 1
+    if n < 6:
+        return 12
+    return int(n * (log(n) + log(log(n)))) + 1
 
 primes = []
 def get_primes():
     global primes
-    if primes:
-        return primes
-        try:
-            primes = []
-            with open(join(dirname(__file__), 'primes.dat'), 'rb') as f:
-                while True:
-                    n = f.read(4)
-                    if not n:
-                        break
-                    primes.append(unpack('i', n)[0])
-        except IOError:
-            print("Cannot find primes.dat, generating primes")
-            primes = sieve()
-            try:
-                store_primes()
-            except IOError:
-                print("Cannot store primes.dat")
-        return primes
+    if not primes:
+        t = prime_table(1000)
+        primes = t[:np.searchsorted(t, 1000)].tolist()
+    return primes
 
 def primes_product(n, m):
-    if not primes:
-        get_primes()
-    res = 1
-    for p in primes[n:m]:
-        res *= p
-    return res
+    t = prime_table(nth_prime_bound(m))
+    return reduce(mul, map(int, t[n:m]), 1)
 
 def primes_prob(n, m):
-    if not primes:
-        get_primes()
-    res = 1
-    for p in primes[n:m]:
-        res *= (1-1./p)
-    return res
+    t = prime_table(nth_prime_bound(m))
+    return reduce(mul, (1-1./p for p in t[n:m].tolist()), 1)
     
 def fermat_test(p, a=2):
     return pow(a, p-1, p) == 1
@@ -143,19 +314,331 @@ def inv32(b):
     x *= 2 - b * x
     return x & 0xffffffff
 
-def prime30():
-    first_primes = 3 * 5 * 7 * 11 * 13 * 17 * 19 * 23 
-    found = False
-    while not found:
-        candidate = grb(30) | 1
-        d = gcd(candidate, first_primes)
-        if d != 1:
-            candidate += (first_primes // d) << 1
-        if candidate >> 30:
+def miller_rabin(n, bases):
+    "strong probable prime test of odd n > 2 to the bases"
+    d, r = n - 1, 0
+    while not d & 1:
+        d >>= 1
+        r += 1
+    for a in bases:
+        a %= n
+        if a in (0, 1, n - 1):
             continue
-        if fermat_test(candidate) and fermat_test(candidate, 3):
-            found = True
-    return candidate
+        x = pow(a, d, n)
+        if x in (1, n - 1):
+            continue
+        for _ in range(r - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    return True
+
+def jacobi(a, n):
+    "Jacobi symbol (a/n), n odd positive"
+    a %= n
+    res = 1
+    while a:
+        while not a & 1:
+            a >>= 1
+            if n & 7 in (3, 5):
+                res = -res
+        a, n = n, a
+        if a & 3 == 3 and n & 3 == 3:
+            res = -res
+        a %= n
+    return res if n == 1 else 0
+
+def lucas_test(n):
+    "strong Lucas probable prime test of odd n, with Selfridge's parameters"
+    if isqrt(n) ** 2 == n:
+        return False
+    D = 5
+    while True:
+        j = jacobi(D, n)
+        if j == -1:
+            break
+        if j == 0 and abs(D) != n:
+            return False
+        D = -D - 2 if D > 0 else -D + 2
+    P, Q = 1, (1 - D) // 4
+    d, s = n + 1, 0
+    while not d & 1:
+        d >>= 1
+        s += 1
+    half = lambda x: (x + n if x & 1 else x) // 2 % n
+    U, V, Qk = 1, P, Q % n
+    for bit in bin(d)[3:]:
+        U, V, Qk = U * V % n, (V * V - 2 * Qk) % n, Qk * Qk % n
+        if bit == '1':
+            U, V, Qk = half(P * U + V), half(D * U + P * V), Qk * Q % n
+    if U == 0 or V == 0:
+        return True
+    for _ in range(s - 1):
+        V, Qk = (V * V - 2 * Qk) % n, Qk * Qk % n
+        if V == 0:
+            return True
+    return False
+
+SMALL_PRIMES = (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41)
+def is_prime(n):
+    if n < 2:
+        return False
+    for p in SMALL_PRIMES:
+        if n % p == 0:
+            return n == p
+    if n < 3317044064679887385961981:
+        return miller_rabin(n, SMALL_PRIMES)
+    return miller_rabin(n, [2]) and lucas_test(n)
+
+def _rho(n, effort=None):
+    """a nontrivial factor of an odd composite n, by Pollard-Brent rho;
+    None after about effort steps"""
+    c, steps = 1, 0
+    while True:
+        y, r, q, g = 2, 1, 1, 1
+        while g == 1:
+            if effort and steps > effort:
+                return None
+            steps += 2 * r
+            x = y
+            for _ in range(r):
+                y = (y * y + c) % n
+            k = 0
+            while k < r and g == 1:
+                ys = y
+                for _ in range(min(128, r - k)):
+                    y = (y * y + c) % n
+                    q = q * abs(x - y) % n
+                g = math_gcd(q, n)
+                k += 128
+            r *= 2
+        if g == n: # backtrack one step at a time
+            g = 1
+            while g == 1:
+                ys = (ys * ys + c) % n
+                g = math_gcd(abs(x - ys), n)
+        if g != n:
+            return g
+        c += 1
+
+def factor(n, effort=None):
+    """the prime factorization {p: e} of n > 0; ValueError if rho
+    needs more than about effort steps for a factor"""
+    res = dict()
+    for p in get_primes():
+        while n % p == 0:
+            res[p] = res.get(p, 0) + 1
+            n //= p
+    stack = [n] if n > 1 else []
+    while stack:
+        m = stack.pop()
+        if is_prime(m):
+            res[m] = res.get(m, 0) + 1
+        else:
+            d = _rho(m, effort)
+            if d is None:
+                raise ValueError("No factor of {} in {} steps".format(m, effort))
+            stack += [d, m // d]
+    return dict(sorted(res.items()))
+
+_products = dict() # limit -> product of primes below limit
+def trial_division(candidates, limit=1 << 16):
+    "the candidates without prime factors below limit"
+    if limit not in _products:
+        t = prime_table(limit)
+        _products[limit] = reduce(mul, map(int, t[:np.searchsorted(t, limit)]), 1)
+    P = _products[limit]
+    return [n for n in candidates if math_gcd(n, P) == 1]
+
+@jit(nopython=True)
+def _sieve_interval(composite, offsets, ps):
+    "mark composite[j] for candidates start + 2*j divisible by ps"
+    n = len(composite)
+    for i in range(len(ps)):
+        for j in range(offsets[i], n, ps[i]):
+            composite[j] = True
+
+def _residues(x, ps):
+    "x mod ps for a long x and an array of small primes"
+    r = np.zeros(len(ps), dtype=np.uint64)
+    for w in reversed(n2a(x)):
+        r = ((r << np.uint64(32)) | np.uint64(w)) % ps
+    return r
+
+def random_prime(bits, count=None, rng=None, window=4096):
+    """a random prime of bits bits (count=None), or an iterator over
+    count primes generated as they are consumed;
+    rng provides getrandbits, like random.Random"""
+    if bits < 2:
+        raise ValueError("No primes of {} bits".format(bits))
+    primes = _random_primes(bits, rng.getrandbits if rng else grb, window)
+    if count is None:
+        return next(primes)
+    return islice(primes, count)
+
+def _random_primes(bits, getrandbits, window):
+    "endless random primes of bits bits"
+    if bits <= 24:
+        while True:
+            n = getrandbits(bits - 1) | (1 << (bits - 1)) | (bits > 2)
+            if is_prime(n):
+                yield n
+    # sieving deeper pays off as the tests get slower
+    limit = 1 << min(22, bits.bit_length() + 10)
+    t = prime_table(limit)
+    ps = np.asarray(t[1:np.searchsorted(t, min(limit, 1 << (bits - 2)))], 
+                    dtype=np.uint64)
+    inv2 = (ps + np.uint64(1)) >> np.uint64(1) # 1/2 mod ps
+    while True:
+        start = getrandbits(bits - 1) | (1 << (bits - 1)) | 1
+        # start + 2*j == 0 mod p for j == -start/2 mod p
+        offsets = (ps - _residues(start, ps)) % ps * inv2 % ps
+        composite = np.zeros(window, dtype=np.bool_)
+        _sieve_interval(composite, offsets.astype(np.int64), ps.astype(np.int64))
+        for j in np.flatnonzero(~composite).tolist():
+            n = start + 2 * j
+            if n >> bits:
+                break
+            if is_prime(n): # base 2 first, so composites fail fast
+                yield n
+                break
+
+@vectorize(["i8(i8, i8)"])
+def _gcd_array(x, y):
+    x, y = abs(x), abs(y)
+    while x > 0:
+        x, y = y % x, x
+    return y
+
+def gcd_many(x, y):
+    "element-wise gcd; a list for numbers beyond int64"
+    try:
+        return _gcd_array(np.asarray(x, dtype=np.int64), np.asarray(y, dtype=np.int64))
+    except OverflowError:
+        return [math_gcd(int(a), int(b)) for a, b in zip(x, y)]
+
+@vectorize(["i8(i8, i8)"])
+def _inverse_array(u, v):
+    a, b, m = 1, 0, v
+    while v:
+        q = u // v
+        u, v = v, u - v * q
+        a, b = b, a - b * q
+    if u != 1:
+        return 0
+    return a % m
+
+def inverse_many(values, modulus):
+    """inverses modulo a shared modulus, or modulo an array of moduli;
+    raises ZeroDivisionError if any value is not invertible"""
+    if np.ndim(modulus):
+        res = _inverse_array(np.asarray(values, dtype=np.int64),
+                             np.asarray(modulus, dtype=np.int64))
+        if not res.all():
+            raise ZeroDivisionError("Not invertible")
+        return res
+    values = [int(v) % modulus for v in values]
+    if not values:
+        return []
+    prefix = [values[0]]
+    for v in values[1:]:
+        prefix.append(prefix[-1] * v % modulus)
+    if math_gcd(prefix[-1], modulus) != 1:
+        raise ZeroDivisionError("Not invertible")
+    inv = inverse(prefix[-1], modulus)
+    res = [0] * len(values)
+    for i in range(len(values) - 1, 0, -1):
+        res[i] = inv * prefix[i - 1] % modulus
+        inv = inv * values[i] % modulus
+    res[0] = inv
+    return res
+
+@jit(nopython=True)
+def _mont_mul(a, b, n, n0, out):
+    "CIOS Montgomery product of rows of LE words, R = 2**(32*l)"
+    count, l = a.shape
+    M, W = np.uint64(0xffffffff), np.uint64(32)
+    t = np.zeros(l + 2, dtype=np.uint64)
+    for k in range(count):
+        t[:] = 0
+        for i in range(l):
+            ai, C = np.uint64(a[k, i]), np.uint64(0)
+            for j in range(l):
+                s = t[j] + ai * np.uint64(b[k, j]) + C
+                t[j], C = s & M, s >> W
+            s = t[l] + C
+            t[l], t[l + 1] = s & M, s >> W
+            m = (t[0] * n0) & M
+            C = (t[0] + m * np.uint64(n[0])) >> W
+            for j in range(1, l):
+                s = t[j] + m * np.uint64(n[j]) + C
+                t[j - 1], C = s & M, s >> W
+            s = t[l] + C
+            t[l - 1], t[l] = s & M, t[l + 1] + (s >> W)
+        # t < 2n, subtract n once if t >= n
+        ge = t[l] != 0
+        if not ge:
+            ge = True
+            for j in range(l - 1, -1, -1):
+                if t[j] != n[j]:
+                    ge = t[j] > n[j]
+                    break
+        borrow = np.uint64(0)
+        for j in range(l):
+            if ge:
+                s = t[j] - np.uint64(n[j]) - borrow
+                borrow = np.uint64(1) if t[j] < np.uint64(n[j]) + borrow else np.uint64(0)
+                out[k, j] = s & M
+            else:
+                out[k, j] = t[j]
+
+class MontgomeryContext(object):
+    "Montgomery arithmetic modulo an odd modulus of l 32-bit words"
+    def __init__(self, modulus):
+        if not modulus & 1:
+            raise ValueError("Montgomery modulus shall be odd")
+        self.n = modulus
+        self.l = (modulus.bit_length() + 31) // 32
+        self.R = 1 << (32 * self.l)
+        self.n0 = (-int(inv32(modulus & 0xffffffff))) & 0xffffffff
+        self.n_prime = -inverse(modulus, self.R) % self.R # -1/n mod R
+        self.words = np.array(n2a(modulus, self.l), dtype=np.uint32)
+    def to_mont(self, x):
+        return x * self.R % self.n
+    def from_mont(self, x):
+        return self.mul(x, 1)
+    def mul(self, a, b):
+        "REDC(a*b) = a*b/R mod n"
+        t = a * b
+        m = (t * self.n_prime) & (self.R - 1)
+        t = (t + m * self.n) >> (32 * self.l)
+        return t - self.n if t >= self.n else t
+    def to_words(self, values):
+        "rows of LE words of the values in Montgomery form"
+        res = np.zeros((len(values), self.l), dtype=np.uint32)
+        for i, v in enumerate(values):
+            res[i] = n2a(self.to_mont(v), self.l)
+        return res
+    def from_words(self, W):
+        "the values of rows in Montgomery form"
+        return [self.from_mont(a2n(row.tolist())) for row in W]
+    def mulmod_words(self, A, B):
+        out = np.empty_like(A)
+        _mont_mul(A, B, self.words, np.uint64(self.n0), out)
+        return out
+    def powmod_words(self, A, e):
+        "rows of A to the same power e, by square-and-multiply"
+        res = np.tile(np.array(n2a(self.to_mont(1), self.l), dtype=np.uint32), (len(A), 1))
+        for bit in bin(e)[2:]:
+            res = self.mulmod_words(res, res)
+            if bit == '1':
+                res = self.mulmod_words(res, A)
+        return res
+
+def prime30():
+    return random_prime(30)
 
 def n2w(x, name="", printing=True):
     "Python integer ->  C style WINT"
@@ -168,36 +651,76 @@ def n2w(x, name="", printing=True):
     return res
     
 def n2f(f, *p):
-    while p:
-        (x, l), p = p[:2], p[2:]
-        f.write(pack('{}I'.format(l), *n2a(x, l)))
-        
-def n2a(n, l=None):
-    "LE array of words"
-    res = []
+    "write pairs x, l (x as l words)"
+    f.write(b''.join(n2bytes(x, l) for x, l in zip(p[::2], p[1::2])))
+
+def n2bytes(n, l=None):
+    "l LE words of n, as bytes"
     if not l:
         l = (n.bit_length() + 31) //32
-    for _ in range(l):
-        i, n = n & 0xffffffff, n >> 32
-        res.append(i)
-    return res
+    return (n & ((1 << (32 * l)) - 1)).to_bytes(4 * l, 'little')
+
+def n2array(n, l=None):
+    "LE array of words, a numpy view of bytes"
+    return np.frombuffer(n2bytes(n, l), dtype='<u4')
+
+def n2a(n, l=None):
+    "LE array of words"
+    return n2array(n, l).tolist()
 
 def a2n(l):
-    res = 0
-    for i in reversed(l): 
-        res <<= 32
-        res |= i
-    return res
+    "an array, or any buffer, of LE words"
+    if not isinstance(l, (bytes, bytearray, memoryview)):
+        l = np.ascontiguousarray(l, dtype='<u4')
+    return int.from_bytes(l, 'little')
     
 def f2n(f, *p):
-    res = []
+    "read integers of p[i] words each"
+    data = memoryview(f.read(4 * sum(p)))
+    if len(data) < 4 * sum(p):
+        raise struct_error("Short read: {} of {} bytes".format(len(data), 4 * sum(p)))
+    res, i = [], 0
     for l in p:
-        x = unpack('{}I'.format(l), f.read(4*l))
-        res.append(a2n(x))
+        res.append(int.from_bytes(data[i:i + 4 * l], 'little'))
+        i += 4 * l
     return res
 
 def read_ints(fname, *lens):
-    return f2n(open(fname, 'rb'), *lens)
+    with open(fname, 'rb') as f:
+        return f2n(f, *lens)
+
+def write_ints(f, records, *lens):
+    """write records of integers of lens words each, 
+    to a file object or a file name"""
+    if isinstance(f, str):
+        with open(f, 'wb') as f:
+            return write_ints(f, records, *lens)
+    f.write(b''.join(n2bytes(x, l) for r in records for x, l in zip(r, lens)))
+
+class Records(object):
+    "a memory-mapped file of records of integers of lens words each"
+    def __init__(self, f, *lens):
+        self.lens = lens
+        self.offsets = np.cumsum((0,) + lens).tolist()
+        size = getsize(f) if isinstance(f, str) else f.seek(0, 2)
+        # mmap cannot map an empty file
+        words = np.memmap(f, dtype='<u4', mode='r') if size else np.zeros(0, '<u4')
+        self.words = words[:len(words) // self.offsets[-1] * self.offsets[-1]
+            ].reshape(-1, self.offsets[-1])
+    def __len__(self):
+        return len(self.words)
+    def __getitem__(self, i):
+        row = memoryview(self.words[i]).cast('B')
+        return [int.from_bytes(row[4 * a:4 * b], 'little') 
+                for a, b in zip(self.offsets, self.offsets[1:])]
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+    def field(self, i):
+        "words of the i-th integer of all records, a view"
+        return self.words[:, self.offsets[i]:self.offsets[i + 1]]
+
+def read_records(fname, *lens):
+    return Records(fname, *lens)
 
 if __name__ == "__main__":
     import sys
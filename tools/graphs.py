@@ -5,10 +5,20 @@
  a group is a dictionary: node_name->properties
  by default, all un-grouped nodes belong to "group" 0
  to add groups, first use add_group
- 
-
+ nodes are interned to integer ids, kept with their group and
+ their forward and backward adjacency for constant time lookups
+  >>> g = Graph()
+  >>> g.add_group("regs")
+  >>> for n in "abcd": g.add_node(n)
+  >>> g.add_node("b", "regs")
+  >>> g.add_edge("a", "b"); g.add_edge("b", "c"); g.add_edge("d", "c")
+  >>> g.find_group_id("b"), g.find_group_id("c"), g.ids["d"]
+  (1, 0, 3)
+  >>> sorted(g.fcone("a")), sorted(g.bcone("c"))
+  (['a', 'b', 'c'], ['a', 'b', 'c', 'd'])
 """
 import re
+from collections import deque
 from os import listdir, mkdir, remove, chdir, getcwd
 from os.path import isdir, join, exists, split, splitext
 from itertools import chain
@@ -28,32 +38,54 @@ class Group(object):
         return (node_name in self.nodes)
     def __iter__(self):
         return iter(self.nodes)
+    def __len__(self):
+        return len(self.nodes)
+    def pop(self, node_name, *default):
+        return self.nodes.pop(node_name, *default)
 class Graph(object):
     def __init__(self):
         self.groups = [dict()]
         self.edges = []
+        self.ids = dict() #node_name -> id
+        self.names = [] #id -> node_name
+        self.node_group = dict() #id -> group id
+        self.group_ids = dict() #group_name -> group id
+        self.succ = dict() #id -> set of target ids
+        self.pred = dict() #id -> set of source ids
+    def node_id(self, node_name):
+        "the interned id of node_name, a new one if not yet known"
+        i = self.ids.get(node_name)
+        if i is None:
+            i = self.ids[node_name] = len(self.names)
+            self.names.append(node_name)
+            self.succ[i] = set()
+            self.pred[i] = set()
+        return i
     def add_group(self, group_name, properties = None):
+        self.group_ids.setdefault(group_name, len(self.groups))
         self.groups.append(Group(group_name, properties))
     def add_node(self, node_name, group_name = "", properties = None):
         prev_group = self.find_group_id(node_name)#may return None
-        group = self.return_group_id(group_name)
+        group = self.return_group_id(group_name) if group_name else 0
+        if group is None:
+            raise KeyError("No group " + repr(group_name))
         if  prev_group != None:
             prev_properties = self.groups[prev_group].pop(node_name)
             assert not prev_properties or not properties
             assert not prev_group or not group
             group = group or prev_group
             properties = properties or prev_properties
-            self.groups[group][node_name] = properties
-        else:
-            self.groups[group][node_name] = properties 
+        self.groups[group][node_name] = properties
+        self.node_group[self.node_id(node_name)] = group
     def find_group_id(self, node_name):
-        for i, group in enumerate(self.groups):
-            if node_name in group: return i
+        i = self.ids.get(node_name)
+        return None if i is None else self.node_group.get(i)
     def return_group_id(self, group_name):
-        for i, group in enumerate(self.groups):
-            if i == 0: continue
-            if group_name == group.name: return i
+        return self.group_ids.get(group_name)
     def add_edge(self, source, target, label = "", properties = None):
+        s, t = self.node_id(source), self.node_id(target)
+        self.succ[s].add(t)
+        self.pred[t].add(s)
         self.edges.append((source, target, label, properties))
     def gml(self, fname, graphics = None):
         graphics = graphics or (lambda x: "")  
@@ -165,26 +197,21 @@ class Graph(object):
                     if not op1: op1 = (operator, s)
                     else: op2 = (operator, s)
                     operator = ""
+        return self
+    def _cone(self, adjacency, init_set):
+        "init_set and all nodes reachable from it by breadth first search"
+        seen = set(self.ids[n] for n in init_set if n in self.ids)
+        queue = deque(seen)
+        while queue:
+            for j in adjacency[queue.popleft()]:
+                if j not in seen:
+                    seen.add(j)
+                    queue.append(j)
+        return set(init_set) | set(self.names[i] for i in seen)
     def fcone(self, *init_set):
-        res = set(init_set)
-        vol = 0
-        while vol != len(res):
-            vol = len(res)
-            for e in self.edges:
-                source, target = e[0], e[1]
-                if source in res: 
-                    res.add(target)
-        return res            
+        return self._cone(self.succ, init_set)
     def bcone(self, *init_set):
-        res = set(init_set)
-        vol = 0
-        while vol != len(res):
-            vol = len(res)
-            for e in self.edges:
-                source, target = e[0], e[1]
-                if target in res: 
-                    res.add(source)
-        return res            
+        return self._cone(self.pred, init_set)
 
                 
 